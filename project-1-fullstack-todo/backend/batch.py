@@ -0,0 +1,97 @@
+import json
+from typing import List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+from store import TodoStore, UndoLog
+
+MAX_BATCH_OPS = 100_000
+
+
+class BatchOp(BaseModel):
+    op: Literal["create", "update", "toggle", "delete"]
+    id: Optional[str] = None
+    task: Optional[str] = None
+
+
+def parse_batch(body: bytes, ndjson: bool) -> List[BatchOp]:
+    # Raises ValueError on malformed input.
+    if ndjson:
+        items = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        items = json.loads(body)
+        if isinstance(items, dict):
+            items = items.get("ops")
+    if not isinstance(items, list):
+        raise ValueError("expected an array of operations")
+    if len(items) > MAX_BATCH_OPS:
+        raise ValueError(f"at most {MAX_BATCH_OPS} operations per batch")
+    ops = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"operation {i} must be an object")
+        try:
+            ops.append(BatchOp(**item))
+        except ValidationError as exc:
+            raise ValueError(f"operation {i}: {exc.errors()[0]['msg']}")
+    return ops
+
+
+def validate_batch(store: TodoStore, ops: List[BatchOp]) -> List[dict]:
+    # Checks every op against the store as it would look after the ops before
+    # it, without mutating anything, so the batch can be applied all-or-nothing.
+    created = set()
+    deleted = set()
+    errors = []
+
+    def exists(todo_id):
+        return todo_id not in deleted and (todo_id in created or store.get(todo_id) is not None)
+
+    for i, op in enumerate(ops):
+        if op.op in ("create", "update") and op.task is None:
+            errors.append({"index": i, "status": 422, "error": "task is required"})
+        elif op.op != "create" and op.id is None:
+            errors.append({"index": i, "status": 422, "error": "id is required"})
+        elif op.op != "create" and not exists(op.id):
+            errors.append({"index": i, "status": 404, "error": "Not found"})
+        elif op.op == "create" and op.id is not None and exists(op.id):
+            errors.append({"index": i, "status": 409, "error": "Already exists"})
+        elif op.op == "create" and op.id is not None:
+            created.add(op.id)
+            deleted.discard(op.id)
+        elif op.op == "delete":
+            deleted.add(op.id)
+            created.discard(op.id)
+    return errors
+
+
+def apply_batch(store: TodoStore, ops: List[BatchOp]) -> Tuple[List[dict], List[dict], UndoLog]:
+    # Returns per-op results, the equivalent journal ops and the undo log that
+    # takes the store back to where it was before the batch.
+    results = []
+    log = []
+    undo: UndoLog = {}
+    for i, op in enumerate(ops):
+        if op.id is not None:
+            store.remember(undo, op.id)
+        if op.op == "create":
+            if op.id is not None:
+                t = store.put(op.id, op.task)
+            else:
+                t = store.add(op.task)
+                undo[t.id] = None
+            log.append({"op": "add", "id": t.id, "task": t.task})
+            results.append({"index": i, "status": 201, "todo": t.as_dict()})
+        elif op.op == "update":
+            t = store.update(op.id, op.task)
+            log.append({"op": "update", "id": t.id, "task": t.task})
+            results.append({"index": i, "status": 200, "todo": t.as_dict()})
+        elif op.op == "toggle":
+            t = store.toggle(op.id)
+            log.append({"op": "toggle", "id": t.id, "completed": t.completed})
+            results.append({"index": i, "status": 200, "todo": t.as_dict()})
+        else:
+            store.delete(op.id)
+            log.append({"op": "delete", "id": op.id})
+            results.append({"index": i, "status": 200, "deleted": op.id})
+    return results, log, undo
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+from typing import Callable, List, Optional
+
+from store import TodoStore
+
+COMMIT_INTERVAL = float(os.getenv("TODO_COMMIT_INTERVAL", "0.005"))
+COMPACT_EVERY = int(os.getenv("TODO_COMPACT_EVERY", "10000"))
+
+
+def apply_op(store: TodoStore, op: dict):
+    kind = op["op"]
+    if kind == "add":
+        store.put(op["id"], op["task"])
+    elif kind == "toggle":
+        store.set_completed(op["id"], op["completed"])
+    elif kind == "update":
+        store.update(op["id"], op["task"])
+    elif kind == "delete":
+        store.delete(op["id"])
+    elif kind == "clear":
+        store.clear_completed()
+    elif kind == "batch":
+        for sub in op["ops"]:
+            apply_op(store, sub)
+
+
+def op_weight(op: dict) -> int:
+    return len(op["ops"]) if op["op"] == "batch" else 1
+
+
+class MemoryJournal:
+    async def open(self, store: TodoStore):
+        pass
+
+    async def append(self, op: dict, undo: Optional[Callable[[], None]] = None):
+        pass
+
+    async def close(self):
+        pass
+
+
+class LogJournal:
+    # Every mutation is appended to todos.log as one JSON line. Appends that
+    # arrive within COMMIT_INTERVAL share a single fsync (group commit). After
+    # COMPACT_EVERY ops the store is written to todos.snapshot.json and the log
+    # starts over; startup loads the snapshot and replays the log tail. When an
+    # fsync fails, todos.log is truncated to the length it had after the last
+    # good one and the store changes of the failed ops are undone, so a todo
+    # change that returned an error cannot reappear after a restart.
+
+    def __init__(self, data_dir: str, commit_interval: float = COMMIT_INTERVAL,
+                 compact_every: int = COMPACT_EVERY):
+        self.data_dir = data_dir
+        self.commit_interval = commit_interval
+        self.compact_every = compact_every
+        self.log_path = os.path.join(data_dir, "todos.log")
+        self.old_log_path = self.log_path + ".1"
+        self.snapshot_path = os.path.join(data_dir, "todos.snapshot.json")
+        self.store = None
+        self._file = None
+        self._seq = 0
+        self._since_snapshot = 0
+        self._durable = 0  # bytes of todos.log known to be on disk
+        self._waiters: List[asyncio.Future] = []
+        self._undos: List[Callable[[], None]] = []  # for the ops in _waiters
+        self._commit_task = None
+        self._io_lock = asyncio.Lock()
+
+    async def open(self, store: TodoStore):
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.store = store
+        snapshot_seq = self._load_snapshot()
+        self._seq = snapshot_seq
+        for path in (self.old_log_path, self.log_path):
+            self._replay(path, snapshot_seq)
+        if os.path.exists(self.old_log_path):
+            # todos.log.1 is only left behind when the process stopped between
+            # rotating the log and saving the snapshot; finish that compaction
+            self._write_snapshot(self._snapshot())
+            os.remove(self.old_log_path)
+            self._since_snapshot = 0
+        self._file = open(self.log_path, "a", encoding="utf-8")
+        self._durable = os.path.getsize(self.log_path)
+        if self._since_snapshot >= self.compact_every:
+            await self.compact()
+
+    def _load_snapshot(self) -> int:
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        for todo_id, task, completed in snapshot["todos"]:
+            self.store.put(todo_id, task, completed)
+        return snapshot["seq"]
+
+    def _replay(self, path: str, snapshot_seq: int):
+        if not os.path.exists(path):
+            return
+        good = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # every acknowledged op ends in "\n"; a last line without
+                    # one was cut off mid-write and is not replayed, however
+                    # complete its JSON looks
+                    break
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                if op["seq"] <= snapshot_seq:
+                    continue
+                apply_op(self.store, op)
+                self._seq = max(self._seq, op["seq"])
+                self._since_snapshot += op_weight(op)
+        if good < os.path.getsize(path):
+            # torn write at the tail: it was never acknowledged, drop it so new
+            # appends do not land behind a broken line
+            os.truncate(path, good)
+
+    async def append(self, op: dict, undo: Optional[Callable[[], None]] = None):
+        # undo reverts the op's change to the store; it runs if the commit
+        # carrying the op fails, before the caller sees the error
+        self._seq += 1
+        op["seq"] = self._seq
+        self._file.write(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._since_snapshot += op_weight(op)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if undo is not None:
+            self._undos.append(undo)
+        if self._commit_task is None:
+            self._commit_task = asyncio.create_task(self._group_commit())
+        await waiter
+
+    async def _group_commit(self):
+        await asyncio.sleep(self.commit_interval)
+        waiters, self._waiters = self._waiters, []
+        undos, self._undos = self._undos, []
+        self._commit_task = None
+        async with self._io_lock:
+            try:
+                self._file.flush()
+                offset = self._file.tell()
+                await asyncio.to_thread(os.fsync, self._file.fileno())
+            except Exception as exc:
+                # the truncation below also removes ops written during the
+                # fsync, so their callers fail together with this commit
+                waiters += self._waiters
+                undos += self._undos
+                self._waiters = []
+                self._undos = []
+                self._rewind()
+                # newest first, so a todo touched by several failed ops ends
+                # up as it was before the oldest of them
+                for undo in reversed(undos):
+                    undo()
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+                return
+            self._durable = offset
+        for waiter in waiters:
+            waiter.set_result(None)
+        if self._since_snapshot >= self.compact_every and not self._io_lock.locked():
+            await self.compact()
+
+    def _rewind(self):
+        # close() writes out (or, if writing fails again, drops) what is still
+        # buffered, then the truncate cuts the file back to its last good
+        # fsync. Otherwise the next successful fsync would persist ops whose
+        # callers got an error.
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        os.truncate(self.log_path, self._durable)
+        self._file = open(self.log_path, "a", encoding="utf-8")
+
+    async def compact(self):
+        async with self._io_lock:
+            # Capture state and rotate the log without yielding to the event loop,
+            # so the snapshot covers exactly the ops up to its seq.
+            snapshot = self._snapshot()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.log_path, self.old_log_path)
+            self._file = open(self.log_path, "a", encoding="utf-8")
+            self._durable = 0
+            self._since_snapshot = 0
+            await asyncio.to_thread(self._write_snapshot, snapshot)
+            os.remove(self.old_log_path)
+
+    def _snapshot(self) -> dict:
+        return {"seq": self._seq, "todos": [[t.id, t.task, t.completed] for t in self.store]}
+
+    def _write_snapshot(self, snapshot: dict):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def close(self):
+        if self._commit_task is not None:
+            await self._commit_task
+        if self._file is None:
+            return
+        if self._since_snapshot:
+            await self.compact()
+        self._file.close()
+        self._file = None
+
+
+def open_journal():
+    backend = os.getenv("TODO_STORAGE", "log")
+    if backend == "memory":
+        return MemoryJournal()
+    return LogJournal(os.getenv("TODO_DATA_DIR", "./data"))
@@ -1,10 +1,25 @@
-import uuid
-from fastapi import FastAPI, HTTPException
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List
 
-app = FastAPI()
+from batch import apply_batch, parse_batch, validate_batch
+from journal import open_journal
+from store import TodoStore, UndoLog
+
+store = TodoStore()
+journal = open_journal()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await journal.open(store)
+    yield
+    await journal.close()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = ["http://localhost:3000", "http://localhost"]
 
@@ -27,46 +42,78 @@ class TodoCreate(BaseModel):
 class TodoUpdate(BaseModel):
     task: str
 
-fake_db: List[TodoItem] = []
+# Every handler changes the store first and then waits for the journal; if
+# the commit fails, the journal runs undo_with's callback so the store never
+# keeps (or later snapshots) a change the client was told had failed
+def undo_with(undo: UndoLog):
+    return lambda: store.restore(undo)
 
 @app.get("/api/todos", response_model=List[TodoItem])
 async def get_todos():
-    return fake_db
+    return [t.as_dict() for t in store]
 
 @app.post("/api/todos", response_model=TodoItem)
 async def add_todo(todo: TodoCreate):
-    new = TodoItem(id=str(uuid.uuid4()), task=todo.task, completed=False)
-    fake_db.append(new)
-    return new
+    t = store.add(todo.task)
+    await journal.append({"op": "add", "id": t.id, "task": t.task}, undo_with({t.id: None}))
+    return t.as_dict()
+
+@app.post("/api/todos/batch")
+async def batch_todos(request: Request):
+    ndjson_in = "application/x-ndjson" in request.headers.get("content-type", "")
+    ndjson_out = "application/x-ndjson" in request.headers.get("accept", "")
+    try:
+        ops = parse_batch(await request.body(), ndjson_in)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    errors = validate_batch(store, ops)
+    if errors:
+        raise HTTPException(status_code=400, detail={"message": "Batch rejected, nothing was applied", "errors": errors})
+    results, log, undo = apply_batch(store, ops)
+    if log:
+        # the whole batch is one journal op, so it is undone as one too
+        await journal.append({"op": "batch", "ops": log}, undo_with(undo))
+    if ndjson_out:
+        lines = (json.dumps(r, ensure_ascii=False) + "\n" for r in results)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    return {"results": results}
 
 @app.patch("/api/todos/{todo_id}", response_model=TodoItem)
 async def toggle_complete(todo_id: str):
-    for t in fake_db:
-        if t.id == todo_id:
-            t.completed = not t.completed
-            return t
-    raise HTTPException(status_code=404, detail="Not found")
+    undo: UndoLog = {}
+    store.remember(undo, todo_id)
+    t = store.toggle(todo_id)
+    if t is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    await journal.append({"op": "toggle", "id": t.id, "completed": t.completed}, undo_with(undo))
+    return t.as_dict()
 
 @app.put("/api/todos/{todo_id}", response_model=TodoItem)
 async def update_task(todo_id: str, data: TodoUpdate):
-    for t in fake_db:
-        if t.id == todo_id:
-            t.task = data.task
-            return t
-    raise HTTPException(status_code=404, detail="Not found")
-
-@app.delete("/api/todos/{todo_id}")
-async def delete_todo(todo_id: str):
-    global fake_db
-    fake_db = [t for t in fake_db if t.id != todo_id]
-    return {"message": "Deleted"}
+    undo: UndoLog = {}
+    store.remember(undo, todo_id)
+    t = store.update(todo_id, data.task)
+    if t is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    await journal.append({"op": "update", "id": t.id, "task": t.task}, undo_with(undo))
+    return t.as_dict()
 
 @app.delete("/api/todos/clear-completed")
 async def clear_completed():
-    global fake_db
-    fake_db = [t for t in fake_db if not t.completed]
+    # cleared records are not touched again, so they serve as their own undo
+    undo: UndoLog = {t.id: t for t in store.completed()}
+    if store.clear_completed():
+        await journal.append({"op": "clear"}, undo_with(undo))
     return {"message": "Completed tasks deleted"}
 
+@app.delete("/api/todos/{todo_id}")
+async def delete_todo(todo_id: str):
+    undo: UndoLog = {}
+    store.remember(undo, todo_id)
+    if store.delete(todo_id):
+        await journal.append({"op": "delete", "id": todo_id}, undo_with(undo))
+    return {"message": "Deleted"}
+
 @app.get("/")
 async def root():
     return {"message": "Server running"}
@@ -0,0 +1,116 @@
+import uuid
+from typing import Dict, Iterator, List, Optional, Set
+
+# todo id -> the record as it was before a change, None if it did not exist
+UndoLog = Dict[str, Optional["TodoRecord"]]
+
+
+class TodoRecord:
+    __slots__ = ("id", "task", "completed", "order")
+
+    def __init__(self, id: str, task: str, completed: bool = False, order: int = 0):
+        self.id = id
+        self.task = task
+        self.completed = completed
+        self.order = order  # insertion position, so a restored todo goes back in place
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "task": self.task, "completed": self.completed}
+
+
+class TodoStore:
+    # dict keeps insertion order for listing; completed ids are tracked
+    # separately so clear_completed only touches completed todos
+
+    def __init__(self):
+        self._items: Dict[str, TodoRecord] = {}
+        self._completed: Set[str] = set()
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[TodoRecord]:
+        return iter(self._items.values())
+
+    def get(self, todo_id: str) -> Optional[TodoRecord]:
+        return self._items.get(todo_id)
+
+    def add(self, task: str) -> TodoRecord:
+        return self.put(str(uuid.uuid4()), task)
+
+    def put(self, todo_id: str, task: str, completed: bool = False) -> TodoRecord:
+        previous = self._items.get(todo_id)
+        if previous is not None:
+            order = previous.order
+        else:
+            order = self._next_order
+            self._next_order += 1
+        record = TodoRecord(todo_id, task, order=order)
+        self._items[todo_id] = record
+        self.set_completed(todo_id, completed)
+        return record
+
+    def set_completed(self, todo_id: str, completed: bool) -> Optional[TodoRecord]:
+        record = self._items.get(todo_id)
+        if record is None:
+            return None
+        record.completed = completed
+        if completed:
+            self._completed.add(todo_id)
+        else:
+            self._completed.discard(todo_id)
+        return record
+
+    def toggle(self, todo_id: str) -> Optional[TodoRecord]:
+        record = self._items.get(todo_id)
+        if record is None:
+            return None
+        return self.set_completed(todo_id, not record.completed)
+
+    def update(self, todo_id: str, task: str) -> Optional[TodoRecord]:
+        record = self._items.get(todo_id)
+        if record is None:
+            return None
+        record.task = task
+        return record
+
+    def delete(self, todo_id: str) -> bool:
+        if self._items.pop(todo_id, None) is None:
+            return False
+        self._completed.discard(todo_id)
+        return True
+
+    def completed(self) -> List[TodoRecord]:
+        return [self._items[todo_id] for todo_id in self._completed]
+
+    def clear_completed(self) -> int:
+        for todo_id in self._completed:
+            del self._items[todo_id]
+        cleared = len(self._completed)
+        self._completed.clear()
+        return cleared
+
+    # --- Undo ---
+    # Changes reach the store before the journal; if the journal append then
+    # fails, the todos they touched are put back from an UndoLog.
+    def remember(self, undo: UndoLog, todo_id: str):
+        # keeps the first state seen, i.e. the one from before the whole change
+        if todo_id not in undo:
+            record = self._items.get(todo_id)
+            undo[todo_id] = None if record is None else TodoRecord(
+                record.id, record.task, record.completed, record.order)
+
+    def restore(self, undo: UndoLog):
+        moved = False
+        for todo_id, record in undo.items():
+            if record is None:
+                self.delete(todo_id)
+                continue
+            current = self._items.get(todo_id)
+            moved = moved or current is None or current.order != record.order
+            self._items[todo_id] = record
+            self.set_completed(todo_id, record.completed)
+        if moved:
+            # a deleted todo comes back at its old position in the listing
+            self._items = dict(sorted(self._items.items(), key=lambda item: item[1].order))
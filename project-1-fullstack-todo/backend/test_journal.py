@@ -0,0 +1,157 @@
+# Restart tests for LogJournal. Run with pytest or directly:
+# python test_journal.py
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Tuple
+
+import journal as journal_module
+from journal import LogJournal
+from store import TodoStore, UndoLog
+
+
+def crash(journal: LogJournal):
+    # stop without close(): no compaction, the log stays as the last fsync left it
+    journal._file.close()
+    journal._file = None
+
+
+@contextmanager
+def failing_fsync():
+    def fail(fd):
+        raise OSError("fsync failed")
+
+    fsync = journal_module.os.fsync
+    journal_module.os.fsync = fail
+    try:
+        yield
+    finally:
+        journal_module.os.fsync = fsync
+
+
+async def reopen(data_dir: str) -> Tuple[LogJournal, TodoStore]:
+    store = TodoStore()
+    journal = LogJournal(data_dir, commit_interval=0)
+    await journal.open(store)
+    return journal, store
+
+
+async def restart_after_torn_tail(data_dir: str):
+    journal, store = await reopen(data_dir)
+    await journal.append({"op": "add", "id": "one", "task": "one"})
+    crash(journal)
+
+    # the crash cut the newline of the last line; its JSON still parses
+    log_path = os.path.join(data_dir, "todos.log")
+    with open(log_path, "rb+") as f:
+        f.truncate(os.path.getsize(log_path) - 1)
+
+    journal, store = await reopen(data_dir)
+    assert store.get("one") is None
+    await journal.append({"op": "add", "id": "two", "task": "two"})
+    await journal.append({"op": "add", "id": "three", "task": "three"})
+    crash(journal)
+
+    journal, store = await reopen(data_dir)
+    assert [t.id for t in store] == ["two", "three"], [t.id for t in store]
+    await journal.close()
+
+
+async def restart_after_partial_line(data_dir: str):
+    journal, store = await reopen(data_dir)
+    await journal.append({"op": "add", "id": "one", "task": "one"})
+    crash(journal)
+
+    log_path = os.path.join(data_dir, "todos.log")
+    with open(log_path, "ab") as f:
+        f.write(b'{"op":"add","id":"tw')
+
+    journal, store = await reopen(data_dir)
+    await journal.append({"op": "add", "id": "two", "task": "two"})
+    crash(journal)
+
+    journal, store = await reopen(data_dir)
+    assert [t.id for t in store] == ["one", "two"], [t.id for t in store]
+    await journal.close()
+
+
+async def restart_after_failed_fsync(data_dir: str):
+    journal, store = await reopen(data_dir)
+    await journal.append({"op": "add", "id": "one", "task": "one"})
+
+    with failing_fsync():
+        try:
+            await journal.append({"op": "add", "id": "two", "task": "two"})
+            raise AssertionError("append should have failed")
+        except OSError:
+            pass
+
+    # the next commit must not carry the failed op along with its own
+    await journal.append({"op": "add", "id": "three", "task": "three"})
+    crash(journal)
+
+    journal, store = await reopen(data_dir)
+    assert [t.id for t in store] == ["one", "three"], [t.id for t in store]
+    await journal.close()
+
+
+async def close_after_failed_append(data_dir: str):
+    journal, store = await reopen(data_dir)
+    for todo_id in ("one", "two", "three"):
+        store.put(todo_id, todo_id)
+        await journal.append({"op": "add", "id": todo_id, "task": todo_id})
+
+    async def change(op: dict, todo_id: str, apply):
+        # what the handlers do: store first, journal second, undo on failure
+        undo: UndoLog = {}
+        store.remember(undo, todo_id)
+        apply()
+        await journal.append(op, lambda: store.restore(undo))
+
+    with failing_fsync():
+        # all three share one failed commit; "three" is touched twice
+        outcome = await asyncio.gather(
+            change({"op": "delete", "id": "two"}, "two", lambda: store.delete("two")),
+            change({"op": "toggle", "id": "three", "completed": True}, "three", lambda: store.toggle("three")),
+            change({"op": "update", "id": "three", "task": "3"}, "three", lambda: store.update("three", "3")),
+            change({"op": "add", "id": "four", "task": "four"}, "four", lambda: store.put("four", "four")),
+            return_exceptions=True,
+        )
+    assert all(isinstance(result, OSError) for result in outcome), outcome
+    expected = [["one", "one", False], ["two", "two", False], ["three", "three", False]]
+    assert [[t.id, t.task, t.completed] for t in store] == expected
+
+    # close() compacts the in-memory state into the snapshot
+    await journal.close()
+    journal, store = await reopen(data_dir)
+    assert [[t.id, t.task, t.completed] for t in store] == expected
+    await journal.close()
+
+
+def test_restart_after_torn_tail():
+    with tempfile.TemporaryDirectory() as data_dir:
+        asyncio.run(restart_after_torn_tail(data_dir))
+
+
+def test_restart_after_partial_line():
+    with tempfile.TemporaryDirectory() as data_dir:
+        asyncio.run(restart_after_partial_line(data_dir))
+
+
+def test_restart_after_failed_fsync():
+    with tempfile.TemporaryDirectory() as data_dir:
+        asyncio.run(restart_after_failed_fsync(data_dir))
+
+
+def test_close_after_failed_append():
+    with tempfile.TemporaryDirectory() as data_dir:
+        asyncio.run(close_after_failed_append(data_dir))
+
+
+if __name__ == "__main__":
+    test_restart_after_torn_tail()
+    test_restart_after_partial_line()
+    test_restart_after_failed_fsync()
+    test_close_after_failed_append()
+    print("ok")
@@ -0,0 +1,129 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import feed
+import models
+from auth import get_current_user
+from database import AsyncReadSessionLocal, AsyncSessionLocal
+from feed import MAX_PAGE_SIZE
+from likes import like_aggregator
+from schemas import PostCreate, PostOut
+
+# --- Async эндпоинттер (DB_ASYNC=1) ---
+router = APIRouter()
+
+
+# --- DB сессия ---
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+async def _user_by_name(db: AsyncSession, username: str) -> Optional[models.User]:
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
+
+
+# --- Пост құру ---
+@router.post("/api/posts")
+async def create_post(data: PostCreate, db: AsyncSession = Depends(get_db), username: str = Depends(get_current_user)):
+    user_obj = await _user_by_name(db, username)
+    if not user_obj:
+        user_obj = models.User(username=username)
+        db.add(user_obj)
+        await db.commit()
+        await db.refresh(user_obj)
+    post = models.Post(text=data.text, owner_id=user_obj.id, timestamp=datetime.utcnow())
+    db.add(post)
+    await db.commit()
+    return {"message": "Пост добавлен"}
+
+# --- Таспа беті ---
+async def feed_response(db: AsyncSession, response: Response, owner_id: Optional[int], cursor: Optional[str], limit: Optional[int]):
+    try:
+        pending = like_aggregator.pending()
+        if limit is None:
+            return [row async for row in feed.aiter_feed(db, owner_id=owner_id, cursor=cursor, pending=pending)]
+        rows, next_cursor = await feed.afetch_page(db, limit, owner_id=owner_id, cursor=cursor, pending=pending)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Жарамсыз курсор")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+# --- Барлық посттарды алу ---
+@router.get("/api/posts", response_model=List[PostOut])
+async def get_posts(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await feed_response(db, response, None, cursor, limit)
+
+# --- Пост жою ---
+@router.delete("/api/posts/{post_id}")
+async def delete_post(post_id: int, db: AsyncSession = Depends(get_db), username: str = Depends(get_current_user)):
+    user_obj = await _user_by_name(db, username)
+    post = await db.get(models.Post, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Пост табылмады")
+    if user_obj is None or post.owner_id != user_obj.id:
+        raise HTTPException(status_code=403, detail="Тек өз постыңды жоя аласың")
+    await db.delete(post)
+    await db.commit()
+    like_aggregator.discard(post_id)
+    return {"message": "Пост удален"}
+
+# --- Белгілі бір пайдаланушының посттары ---
+@router.get("/api/users/{username}/posts", response_model=List[PostOut])
+async def get_user_posts(
+    username: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    user = await _user_by_name(db, username)
+    if not user:
+        raise HTTPException(status_code=404, detail="Пайдаланушы табылмады")
+    return await feed_response(db, response, user.id, cursor, limit)
+
+# --- Лайк басу ---
+@router.post("/api/posts/{post_id}/like")
+async def like_post(post_id: int, db: AsyncSession = Depends(get_db), username: str = Depends(get_current_user)):
+    user = await _user_by_name(db, username)
+    post = await db.get(models.Post, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Пост табылмады")
+    db.add(models.Like(user_id=user.id, post_id=post_id))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # (user_id, post_id) бірегей индексі қайталанған лайкты тоқтатады
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Сен бұл постқа лайк басқансың")
+    like_aggregator.record(post_id, 1)
+    return {"message": "Лайк қойылды"}
+
+# --- Лайкты алып тастау ---
+@router.delete("/api/posts/{post_id}/like")
+async def unlike_post(post_id: int, db: AsyncSession = Depends(get_db), username: str = Depends(get_current_user)):
+    user = await _user_by_name(db, username)
+    result = await db.execute(
+        delete(models.Like).where(models.Like.user_id == user.id, models.Like.post_id == post_id)
+    )
+    if not result.rowcount:
+        raise HTTPException(status_code=404, detail="Сен бұл постқа лайк баспағансың")
+    await db.commit()
+    like_aggregator.record(post_id, -1)
+    return {"message": "Лайк алынып тасталды"}
@@ -0,0 +1,17 @@
+from fastapi import Header, HTTPException
+
+# --- Фейк қолданушылар ---
+fake_users = {
+    "user1": {"username": "user1", "password": "password1"},
+    "user2": {"username": "user2", "password": "password2"},
+}
+
+# --- Токен тексеру ---
+def get_current_user(authorization: str = Header(...)):
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Bearer token missing")
+    token = authorization.split(" ")[1]
+    user = fake_users.get(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return token  # user_id ретінде username қайтарылады
@@ -0,0 +1,107 @@
+# Sync және async DB жолдарын салыстыратын жүктеме тесті.
+# Қолданылуы: python bench_db.py [--posts 2000] [--concurrency 64] [--duration 10]
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def start_server(port: int, db_path: str, use_async: bool, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", DB_ASYNC="1" if use_async else "0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+
+
+async def wait_ready(base: str):
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"{base}/api/metrics/db")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("Сервер іске қосылмады")
+
+
+async def seed(base: str, posts: int):
+    async with httpx.AsyncClient(base_url=base) as client:
+        for i in range(posts):
+            headers = {"Authorization": f"Bearer user{i % 2 + 1}"}
+            await client.post("/api/posts", json={"text": f"bench post {i}"}, headers=headers)
+
+
+async def load(base: str, posts: int, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    headers = {"Authorization": "Bearer user2"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, headers=headers, limits=limits, timeout=30) as client:
+        async def worker(n: int):
+            nonlocal errors
+            i = 0
+            while time.perf_counter() < deadline:
+                i += 1
+                started = time.perf_counter()
+                # 9 оқу : 1 лайк — таспаға тән жүктеме
+                if i % 10 == 0:
+                    r = await client.post(f"/api/posts/{(n * 31 + i) % posts + 1}/like")
+                    ok = r.status_code in (200, 400)
+                else:
+                    r = await client.get("/api/posts", params={"limit": 20})
+                    ok = r.status_code == 200
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def run(args) -> dict:
+    results = {}
+    for port, use_async in ((args.port, False), (args.port + 1, True)):
+        name = "async" if use_async else "sync"
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            server = start_server(port, db_path, use_async, args.workers)
+            base = f"http://127.0.0.1:{port}"
+            try:
+                await wait_ready(base)
+                await seed(base, args.posts)
+                results[name] = await load(base, args.posts, args.concurrency, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+        print(f"{name:>5}: {results[name]}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8100)
+    asyncio.run(run(parser.parse_args()))
@@ -1,10 +1,148 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+load_dotenv()
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./blog.db")
+# DB_ASYNC=1 — эндпоинттер aiosqlite арқылы AsyncSession-мен жұмыс істейді
+USE_ASYNC_DB = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# --- SQLite профилі ---
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # теріс мән = KiB
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+READ_POOL_OVERFLOW = int(os.getenv("DB_READ_POOL_OVERFLOW", "4"))
+
+
+def _apply_pragmas(dbapi_connection, readonly: bool):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    if not readonly:
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    if readonly:
+        cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+
+
+# --- Пул метрикалары ---
+class PoolMetrics:
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.checkouts = 0
+        self.connects = 0
+        self._lock = threading.Lock()
+        self._held_since = {}
+        self.total_hold_time = 0.0
+        self.max_hold_time = 0.0
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./blog.db"
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self._held_since[id(connection_record)] = time.perf_counter()
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        started = self._held_since.pop(id(connection_record), None)
+        if started is None:
+            return
+        held = time.perf_counter() - started
+        with self._lock:
+            self.total_hold_time += held
+            self.max_hold_time = max(self.max_hold_time, held)
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "avg_hold_ms": round(self.total_hold_time / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_hold_ms": round(self.max_hold_time * 1000, 3),
+            }
+
+
+# --- Engine-дер: бір жазушы және оқуға арналған пул ---
+# Жазушы бір қосылыммен шектеледі, сондықтан жазбалар процесс ішінде кезекпен жүреді.
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+)
+read_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_OVERFLOW,
+)
+
+event.listen(engine, "connect", lambda conn, record: _apply_pragmas(conn, readonly=False))
+event.listen(read_engine, "connect", lambda conn, record: _apply_pragmas(conn, readonly=True))
+
+pool_metrics = {
+    "writer": PoolMetrics("writer", engine),
+    "reader": PoolMetrics("reader", read_engine),
+}
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# --- Async engine-дер (aiosqlite) ---
+async_engine = None
+async_read_engine = None
+AsyncSessionLocal = None
+AsyncReadSessionLocal = None
+
+if USE_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+    )
+    async_read_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=READ_POOL_SIZE,
+        max_overflow=READ_POOL_OVERFLOW,
+    )
+    event.listen(async_engine.sync_engine, "connect", lambda conn, record: _apply_pragmas(conn, readonly=False))
+    event.listen(async_read_engine.sync_engine, "connect", lambda conn, record: _apply_pragmas(conn, readonly=True))
+    pool_metrics["async_writer"] = PoolMetrics("async_writer", async_engine.sync_engine)
+    pool_metrics["async_reader"] = PoolMetrics("async_reader", async_read_engine.sync_engine)
+
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
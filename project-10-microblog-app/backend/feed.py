@@ -0,0 +1,130 @@
+import base64
+from datetime import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+import models
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Бір SQL пакетіндегі посттар саны (әр пакет = 1 сұраныс)
+FEED_BATCH_SIZE = 500
+# Бір беттегі посттардың максималды саны
+MAX_PAGE_SIZE = 200
+
+
+# --- Курсор (timestamp, id) ---
+def encode_cursor(timestamp: datetime, post_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{post_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        ts, post_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(post_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+# --- Сұраныстар ---
+def _page_select(owner_id: Optional[int], after: Optional[Tuple[datetime, int]], size: int):
+    stmt = (
+        select(
+            models.Post.id,
+            models.Post.text,
+            models.Post.timestamp,
+            models.Post.owner_id,
+            models.Post.like_count,
+            models.User.username,
+        )
+        .join(models.User, models.User.id == models.Post.owner_id)
+    )
+    if owner_id is not None:
+        stmt = stmt.where(models.Post.owner_id == owner_id)
+    if after is not None:
+        ts, post_id = after
+        stmt = stmt.where(or_(
+            models.Post.timestamp < ts,
+            and_(models.Post.timestamp == ts, models.Post.id < post_id),
+        ))
+    return stmt.order_by(models.Post.timestamp.desc(), models.Post.id.desc()).limit(size)
+
+
+def _to_out(row, pending: Dict[int, int]) -> dict:
+    return {
+        "id": row.id,
+        "text": row.text,
+        "timestamp": row.timestamp,
+        "owner_id": row.owner_id,
+        "owner_username": row.username,
+        "like_count": row.like_count + pending.get(row.id, 0),
+    }
+
+
+def _batch_size(remaining: Optional[int]) -> int:
+    return FEED_BATCH_SIZE if remaining is None else min(FEED_BATCH_SIZE, remaining)
+
+
+def _split_page(rows: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+# --- Таспа ---
+def iter_feed(db: Session, owner_id: Optional[int] = None, cursor: Optional[str] = None,
+              limit: Optional[int] = None, pending: Optional[Dict[int, int]] = None) -> Iterator[dict]:
+    # Жаңа посттар алдымен; limit=None болса бүкіл таспа пакеттермен ағызылады.
+    # pending — әлі базаға жазылмаған лайк айырмалары (LikeAggregator.pending)
+    pending = pending or {}
+    after = decode_cursor(cursor) if cursor else None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = _batch_size(remaining)
+        rows = db.execute(_page_select(owner_id, after, size)).all()
+        for row in rows:
+            yield _to_out(row, pending)
+        if len(rows) < size:
+            return
+        after = (rows[-1].timestamp, rows[-1].id)
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def fetch_page(db: Session, limit: int, owner_id: Optional[int] = None, cursor: Optional[str] = None,
+               pending: Optional[Dict[int, int]] = None) -> Tuple[List[dict], Optional[str]]:
+    rows = list(iter_feed(db, owner_id=owner_id, cursor=cursor, limit=limit + 1, pending=pending))
+    return _split_page(rows, limit)
+
+
+# --- Таспа (async) ---
+async def aiter_feed(db: "AsyncSession", owner_id: Optional[int] = None, cursor: Optional[str] = None,
+                     limit: Optional[int] = None, pending: Optional[Dict[int, int]] = None) -> AsyncIterator[dict]:
+    pending = pending or {}
+    after = decode_cursor(cursor) if cursor else None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = _batch_size(remaining)
+        rows = (await db.execute(_page_select(owner_id, after, size))).all()
+        for row in rows:
+            yield _to_out(row, pending)
+        if len(rows) < size:
+            return
+        after = (rows[-1].timestamp, rows[-1].id)
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+async def afetch_page(db: "AsyncSession", limit: int, owner_id: Optional[int] = None, cursor: Optional[str] = None,
+                      pending: Optional[Dict[int, int]] = None) -> Tuple[List[dict], Optional[str]]:
+    rows = [row async for row in aiter_feed(db, owner_id=owner_id, cursor=cursor, limit=limit + 1, pending=pending)]
+    return _split_page(rows, limit)
+
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from sqlalchemy import text
+
+from database import SessionLocal
+
+# Лайк санауыштарын базаға жазу аралығы (секунд)
+FLUSH_INTERVAL = 1.0
+# Санауыштарды likes кестесімен салыстыру аралығы (секунд)
+RECONCILE_INTERVAL = 600.0
+# Айырма табылса, осынша уақыттан кейін қайта тексеріледі (секунд)
+RECONCILE_CONFIRM_DELAY = 30.0
+
+
+# --- Лайк оқиғаларын жинақтаушы (write-behind) ---
+class LikeAggregator:
+    def __init__(self, session_factory, interval: float = FLUSH_INTERVAL,
+                 reconcile_interval: float = RECONCILE_INTERVAL,
+                 confirm_delay: float = RECONCILE_CONFIRM_DELAY):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self.confirm_delay = confirm_delay
+        # post_id -> (like_count, likes саны, алғаш көрінген уақыт) — расталмаған айырмалар
+        self._suspects: Dict[int, Tuple[int, int, float]] = {}
+        self._pending: Dict[int, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, post_id: int, delta: int):
+        # Бір посттағы лайк/анлайк серияларын бір айырмаға біріктіреміз
+        with self._lock:
+            self._pending[post_id] += delta
+            if self._pending[post_id] == 0:
+                del self._pending[post_id]
+
+    def pending(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._pending)
+
+    def discard(self, post_id: int):
+        with self._lock:
+            self._pending.pop(post_id, None)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(int)
+            if not batch:
+                return 0
+            db = self.session_factory()
+            try:
+                db.execute(
+                    text("UPDATE posts SET like_count = like_count + :delta WHERE id = :post_id"),
+                    [{"post_id": post_id, "delta": delta} for post_id, delta in batch.items()],
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Жазылмаған айырмаларды келесі флашқа қайтарамыз
+                for post_id, delta in batch.items():
+                    self.record(post_id, delta)
+                raise
+            finally:
+                db.close()
+            return len(batch)
+
+    def reconcile(self) -> int:
+        # likes кестесі — шындық көзі. Бірақ айырманың бір бөлігі әлі
+        # флашталмаған дельталар болуы мүмкін (бұл воркерде немесе басқа
+        # uvicorn воркерлерінде), оларды тастау немесе үстінен жазу
+        # санауышты екі рет өзгертеді. Сондықтан пост тек бірдей
+        # (like_count, likes саны) айырмасы кемінде confirm_delay бойы
+        # (көптеген флаш аралығы) өзгермесе түзетіледі: арада кез келген
+        # флаш не лайк мәндерді өзгертеді. UPDATE сол мәндер әлі
+        # өзгермегенде ғана орындалады.
+        with self._flush_lock:
+            pending = self.pending()
+            now = time.monotonic()
+            db = self.session_factory()
+            try:
+                rows = db.execute(DRIFT_SQL).all()
+                suspects, self._suspects = self._suspects, {}
+                fixed = 0
+                for post_id, like_count, actual in rows:
+                    seen = suspects.get(post_id)
+                    if seen is None or seen[:2] != (like_count, actual) or post_id in pending:
+                        self._suspects[post_id] = (like_count, actual, now)
+                        continue
+                    if now - seen[2] < self.confirm_delay:
+                        self._suspects[post_id] = seen
+                        continue
+                    fixed += db.execute(
+                        FIX_SQL, {"post_id": post_id, "seen": like_count, "actual": actual}
+                    ).rowcount
+                db.commit()
+                return fixed
+            finally:
+                db.close()
+
+    def _run(self):
+        next_reconcile = time.monotonic() + self.reconcile_interval
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+                if time.monotonic() >= next_reconcile:
+                    self.reconcile()
+                    # күдікті посттар болса, оларды көп күттірмей растаймыз
+                    delay = self.confirm_delay if self._suspects else self.reconcile_interval
+                    next_reconcile = time.monotonic() + delay
+            except Exception as exc:
+                print(f"Лайктарды жазу қатесі: {exc}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="like-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+like_aggregator = LikeAggregator(SessionLocal)
+
+
+# --- Санауыштарды likes кестесінен қайта құру ---
+# Миграцияларда (дельталар әлі жоқ кезде) бәрін бірден түзетеді
+RECONCILE_SQL = text(
+    "UPDATE posts SET like_count = "
+    "(SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id) "
+    "WHERE like_count != (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id)"
+)
+
+
+# Жұмыс кезіндегі салыстыру: айырмасы бар посттар және шартты түзету
+DRIFT_SQL = text(
+    "SELECT id, like_count, (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id) AS actual "
+    "FROM posts WHERE like_count != (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id)"
+)
+FIX_SQL = text(
+    "UPDATE posts SET like_count = :actual WHERE id = :post_id AND like_count = :seen "
+    "AND (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id) = :actual"
+)
@@ -1,16 +1,32 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Header
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, status, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
+import feed
+import migrations
 import models
-from database import SessionLocal, engine, Base
-from pydantic import BaseModel
+from auth import fake_users, get_current_user
+from database import SessionLocal, ReadSessionLocal, USE_ASYNC_DB, async_engine, async_read_engine, pool_metrics
+from feed import MAX_PAGE_SIZE
+from likes import like_aggregator
+from schemas import LoginRequest, PostCreate, PostOut
 from uuid import uuid4
 
 # --- Инициализация ---
-app = FastAPI()
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    migrations.upgrade()
+    like_aggregator.start()
+    yield
+    like_aggregator.stop()
+    if USE_ASYNC_DB:
+        await async_engine.dispose()
+        await async_read_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS ---
 app.add_middleware(
@@ -19,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # --- DB сессия ---
@@ -29,30 +46,13 @@ def get_db():
     finally:
         db.close()
 
-# --- Фейк қолданушылар ---
-fake_users = {
-    "user1": {"username": "user1", "password": "password1"},
-    "user2": {"username": "user2", "password": "password2"},
-}
-
-# --- Pydantic модельдер ---
-class LoginRequest(BaseModel):
-    username: str
-    password: str
-
-class PostCreate(BaseModel):
-    text: str
-
-class PostOut(BaseModel):
-    id: int
-    text: str
-    timestamp: datetime
-    owner_id: int
-    owner_username: str
-    like_count: int
-
-    class Config:
-        orm_mode = True
+# Тек оқитын эндпоинттер үшін: жазушыны күтпейтін бөлек пул
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
 # --- Авторизация ---
 @app.post("/api/login")
@@ -63,18 +63,11 @@ def login(data: LoginRequest):
     token = data.username  # Токен ретінде username-ді қолданамыз
     return {"access_token": token, "user": {"username": data.username}}
 
-# --- Токен тексеру ---
-def get_current_user(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Bearer token missing")
-    token = authorization.split(" ")[1]
-    user = fake_users.get(token)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    return token  # user_id ретінде username қайтарылады
+# --- Sync эндпоинттер (DB_ASYNC=1 болса async_routes қолданылады) ---
+sync_router = APIRouter()
 
 # --- Пост құру ---
-@app.post("/api/posts")
+@sync_router.post("/api/posts")
 def create_post(data: PostCreate, db: Session = Depends(get_db), username: str = Depends(get_current_user)):
     user_obj = db.query(models.User).filter(models.User.username == username).first()
     if not user_obj:
@@ -88,26 +81,31 @@ def create_post(data: PostCreate, db: Session = Depends(get_db), username: str =
     db.refresh(post)
     return {"message": "Пост добавлен"}
 
+# --- Таспа беті ---
+def feed_response(db: Session, response: Response, owner_id: Optional[int], cursor: Optional[str], limit: Optional[int]):
+    try:
+        pending = like_aggregator.pending()
+        if limit is None:
+            return list(feed.iter_feed(db, owner_id=owner_id, cursor=cursor, pending=pending))
+        rows, next_cursor = feed.fetch_page(db, limit, owner_id=owner_id, cursor=cursor, pending=pending)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Жарамсыз курсор")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 # --- Барлық посттарды алу ---
-@app.get("/api/posts", response_model=List[PostOut])
-def get_posts(db: Session = Depends(get_db)):
-    posts = db.query(models.Post).all()
-    result = []
-    for post in posts:
-        owner = db.query(models.User).filter(models.User.id == post.owner_id).first()
-        like_count = db.query(models.Like).filter(models.Like.post_id == post.id).count()
-        result.append(PostOut(
-            id=post.id,
-            text=post.text,
-            timestamp=post.timestamp,
-            owner_id=post.owner_id,
-            owner_username=owner.username,
-            like_count=like_count
-        ))
-    return result
+@sync_router.get("/api/posts", response_model=List[PostOut])
+def get_posts(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+):
+    return feed_response(db, response, None, cursor, limit)
 
 # --- Пост жою ---
-@app.delete("/api/posts/{post_id}")
+@sync_router.delete("/api/posts/{post_id}")
 def delete_post(post_id: int, db: Session = Depends(get_db), username: str = Depends(get_current_user)):
     user_obj = db.query(models.User).filter(models.User.username == username).first()
     post = db.query(models.Post).filter(models.Post.id == post_id).first()
@@ -117,30 +115,25 @@ def delete_post(post_id: int, db: Session = Depends(get_db), username: str = Dep
         raise HTTPException(status_code=403, detail="Тек өз постыңды жоя аласың")
     db.delete(post)
     db.commit()
+    like_aggregator.discard(post_id)
     return {"message": "Пост удален"}
 
 # --- Белгілі бір пайдаланушының посттары ---
-@app.get("/api/users/{username}/posts", response_model=List[PostOut])
-def get_user_posts(username: str, db: Session = Depends(get_db)):
+@sync_router.get("/api/users/{username}/posts", response_model=List[PostOut])
+def get_user_posts(
+    username: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+):
     user = db.query(models.User).filter(models.User.username == username).first()
     if not user:
         raise HTTPException(status_code=404, detail="Пайдаланушы табылмады")
-    posts = db.query(models.Post).filter(models.Post.owner_id == user.id).all()
-    result = []
-    for post in posts:
-        like_count = db.query(models.Like).filter(models.Like.post_id == post.id).count()
-        result.append(PostOut(
-            id=post.id,
-            text=post.text,
-            timestamp=post.timestamp,
-            owner_id=post.owner_id,
-            owner_username=username,
-            like_count=like_count
-        ))
-    return result
+    return feed_response(db, response, user.id, cursor, limit)
 
 # --- Лайк басу ---
-@app.post("/api/posts/{post_id}/like")
+@sync_router.post("/api/posts/{post_id}/like")
 def like_post(post_id: int, db: Session = Depends(get_db), username: str = Depends(get_current_user)):
     user = db.query(models.User).filter(models.User.username == username).first()
     post = db.query(models.Post).filter(models.Post.id == post_id).first()
@@ -151,11 +144,17 @@ def like_post(post_id: int, db: Session = Depends(get_db), username: str = Depen
         raise HTTPException(status_code=400, detail="Сен бұл постқа лайк басқансың")
     like = models.Like(user_id=user.id, post_id=post_id)
     db.add(like)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Параллель сұраныс лайкты бізден бұрын жазып үлгерді
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Сен бұл постқа лайк басқансың")
+    like_aggregator.record(post_id, 1)
     return {"message": "Лайк қойылды"}
 
 # --- Лайкты алып тастау ---
-@app.delete("/api/posts/{post_id}/like")
+@sync_router.delete("/api/posts/{post_id}/like")
 def unlike_post(post_id: int, db: Session = Depends(get_db), username: str = Depends(get_current_user)):
     user = db.query(models.User).filter(models.User.username == username).first()
     like = db.query(models.Like).filter(models.Like.user_id == user.id, models.Like.post_id == post_id).first()
@@ -163,4 +162,16 @@ def unlike_post(post_id: int, db: Session = Depends(get_db), username: str = Dep
         raise HTTPException(status_code=404, detail="Сен бұл постқа лайк баспағансың")
     db.delete(like)
     db.commit()
+    like_aggregator.record(post_id, -1)
     return {"message": "Лайк алынып тасталды"}
+
+if USE_ASYNC_DB:
+    import async_routes
+    app.include_router(async_routes.router)
+else:
+    app.include_router(sync_router)
+
+# --- DB пул метрикалары ---
+@app.get("/api/metrics/db")
+def db_metrics():
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
@@ -0,0 +1,100 @@
+import sys
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+import models  # noqa: F401  (кестелер Base.metadata-ға тіркелуі үшін)
+from database import Base, engine
+from likes import RECONCILE_SQL
+
+
+# --- Миграциялар ---
+# Әр миграция бір рет орындалады; нұсқа SQLite PRAGMA user_version-да сақталады.
+def _create_tables(conn: Connection):
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_like_count(conn: Connection):
+    columns = {column["name"] for column in inspect(conn).get_columns("posts")}
+    if "like_count" not in columns:
+        conn.execute(text("ALTER TABLE posts ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(RECONCILE_SQL)
+
+
+def _add_indexes(conn: Connection):
+    # Бірегей индекс алдында қайталанған лайктарды тазалаймыз
+    conn.execute(text(
+        "DELETE FROM likes WHERE id NOT IN "
+        "(SELECT MIN(id) FROM likes GROUP BY user_id, post_id)"
+    ))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_likes_user_post ON likes (user_id, post_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_likes_post_id ON likes (post_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_posts_timestamp ON posts (timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_posts_owner_timestamp ON posts (owner_id, timestamp)"))
+    conn.execute(RECONCILE_SQL)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create tables", _create_tables),
+    (2, "posts.like_count", _add_like_count),
+    (3, "likes/posts indexes", _add_indexes),
+]
+
+
+def current_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def upgrade(bind=engine) -> List[int]:
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        with bind.begin() as conn:
+            if current_version(conn) >= version:
+                continue
+            migrate(conn)
+            conn.execute(text(f"PRAGMA user_version = {version}"))
+        applied.append(version)
+        print(f"Миграция {version} орындалды: {name}")
+    return applied
+
+
+# --- Ыстық сұраныстар индексті қолданатынын тексеру (EXPLAIN QUERY PLAN) ---
+HOT_QUERIES = {
+    "like exists": "SELECT id FROM likes WHERE user_id = 1 AND post_id = 1",
+    "likes by post": "SELECT COUNT(*) FROM likes WHERE post_id = 1",
+    "feed page": "SELECT id FROM posts ORDER BY timestamp DESC, id DESC LIMIT 20",
+    "user posts": "SELECT id FROM posts WHERE owner_id = 1 ORDER BY timestamp DESC, id DESC LIMIT 20",
+}
+
+
+def explain(conn: Connection, sql: str) -> List[str]:
+    return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def check_hot_queries(bind=engine) -> List[str]:
+    problems = []
+    with bind.connect() as conn:
+        for name, sql in HOT_QUERIES.items():
+            plan = explain(conn, sql)
+            uses_index = any("USING" in step and "INDEX" in step for step in plan)
+            if not uses_index or any("TEMP B-TREE" in step for step in plan):
+                problems.append(f"{name}: {' / '.join(plan)}")
+    return problems
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        upgrade()
+    elif command == "status":
+        with engine.connect() as conn:
+            print(f"Схема нұсқасы: {current_version(conn)} / {MIGRATIONS[-1][0]}")
+    elif command == "check":
+        problems = check_hot_queries()
+        for problem in problems:
+            print(f"Индекс қолданылмайды — {problem}")
+        sys.exit(1 if problems else 0)
+    else:
+        print("Қолданылуы: python migrations.py [upgrade|status|check]")
+        sys.exit(2)
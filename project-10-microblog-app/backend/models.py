@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -14,17 +14,26 @@ class User(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("ix_posts_timestamp", "timestamp"),
+        Index("ix_posts_owner_timestamp", "owner_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String)
     timestamp = Column(DateTime, default=datetime.utcnow)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     owner = relationship("User", back_populates="posts")
     likes = relationship("Like", back_populates="post")
 
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (
+        Index("uq_likes_user_post", "user_id", "post_id", unique=True),
+        Index("ix_likes_post_id", "post_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+# --- Pydantic модельдер ---
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+class PostCreate(BaseModel):
+    text: str
+
+class PostOut(BaseModel):
+    id: int
+    text: str
+    timestamp: datetime
+    owner_id: int
+    owner_username: str
+    like_count: int
+
+    class Config:
+        orm_mode = True
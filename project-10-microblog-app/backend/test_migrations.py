@@ -0,0 +1,27 @@
+# Schema tests: every hot query must stay on an index after upgrade().
+# Run with pytest or directly: python test_migrations.py
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+
+from migrations import MIGRATIONS, check_hot_queries, current_version, upgrade
+
+
+def test_hot_queries_use_indexes():
+    with tempfile.TemporaryDirectory() as data_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(data_dir, 'test.db')}")
+        try:
+            assert upgrade(engine) == [version for version, _, _ in MIGRATIONS]
+            with engine.connect() as conn:
+                assert current_version(conn) == MIGRATIONS[-1][0]
+            assert check_hot_queries(engine) == []
+            # a second run is a no-op
+            assert upgrade(engine) == []
+        finally:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    test_hot_queries_use_indexes()
+    print("ok")
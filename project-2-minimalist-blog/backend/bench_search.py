@@ -0,0 +1,86 @@
+# Synthetic benchmark for the search index.
+# Usage: python bench_search.py [--docs 100000] [--queries 2000]
+import argparse
+import itertools
+import random
+import statistics
+import time
+
+from search import SearchIndex
+
+STEMS = (
+    "python fastapi next react backend frontend сервер клиент база деректер "
+    "бағдарлама тіл жоба қосымша блог пост веб даму жаңалық код функция "
+    "класс модель запрос ответ данные программа язык проект приложение"
+).split()
+SUFFIXES = ["", "лар", "дың", "ға", "ы", "ов", "ами", "ing", "er", "ция", "ние"]
+CATEGORIES = ["Жаңалықтар", "Веб-даму", "Бағдарламалау", "Python", "DevOps"]
+
+
+def make_vocabulary(rng: random.Random, size: int):
+    words = set()
+    while len(words) < size:
+        word = rng.choice(STEMS) + rng.choice(SUFFIXES)
+        if rng.random() < 0.7:
+            word += "".join(rng.choice("абвгдеәғқңөұүһіklmnopr") for _ in range(rng.randint(1, 4)))
+        words.add(word)
+    return sorted(words)
+
+
+def make_docs(vocab, docs: int, rng: random.Random):
+    # Zipf-like weights so a few terms are very common and most are rare
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocab))))
+    for i in range(docs):
+        yield f"post-{i}", {
+            "title": " ".join(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(3, 8))),
+            "category": rng.choice(CATEGORIES),
+            "content": " ".join(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(80, 300))),
+        }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(args):
+    rng = random.Random(42)
+    vocab = make_vocabulary(rng, 50_000)
+    index = SearchIndex()
+    started = time.perf_counter()
+    docs = make_docs(vocab, args.docs + 1, rng)
+    for doc_id, fields in itertools.islice(docs, args.docs):
+        index.add(doc_id, fields)
+    _, edited = next(docs)
+    print(f"indexed {len(index)} docs in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    kinds = {
+        "rare term": lambda: rng.choice(vocab[len(vocab) // 2:]),
+        "common term": lambda: rng.choice(vocab[:50]),
+        "two terms": lambda: f"{rng.choice(vocab[:2000])} {rng.choice(vocab[:2000])}",
+        "prefix": lambda: rng.choice(vocab[:5000])[:4] + "*",
+    }
+    for name, make_query in kinds.items():
+        queries = [make_query() for _ in range(args.queries)]
+        # first pass builds the per-term score lists, second pass reuses them;
+        # the third follows an upsert, which only evicts the terms it touched
+        for label in ("cold", "warm", "after write"):
+            if label == "after write":
+                t = time.perf_counter()
+                index.add(f"post-{rng.randrange(args.docs)}", edited)
+                print(f"{'':>12} upsert with a warm cache: {(time.perf_counter() - t) * 1000:.2f} ms")
+            latencies = []
+            for q in queries:
+                t = time.perf_counter()
+                index.search(q)
+                latencies.append((time.perf_counter() - t) * 1000)
+            print(f"{name:>12} {label:>11}: p50 {statistics.median(latencies):.3f} ms, "
+                  f"p99 {percentile(latencies, 0.99):.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    run(parser.parse_args())
@@ -0,0 +1,160 @@
+import os
+import threading
+import zlib
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from models import PostFull
+from repository import PostRepository
+
+BODY_CACHE_SIZE = int(os.getenv("BLOG_BODY_CACHE_SIZE", "256"))
+POLL_INTERVAL = float(os.getenv("BLOG_POLL_INTERVAL", "2.0"))
+FRONT_MATTER = b"---"
+
+
+@lru_cache(maxsize=BODY_CACHE_SIZE)
+def _read_body(path: str, offset: int, mtime_ns: int) -> str:
+    # mtime_ns is part of the cache key, so an edited file never hits a stale entry
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read().decode("utf-8").rstrip("\n")
+
+
+class FilePost:
+    # Post whose header fields are kept in memory and whose body is read from
+    # disk on first access.
+    __slots__ = ("id", "title", "slug", "author", "date", "category", "path", "body_offset", "mtime_ns")
+
+    def __init__(self, path: str, body_offset: int, mtime_ns: int, meta: Dict[str, str]):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        self.slug = meta.get("slug", stem)
+        self.id = int(meta["id"]) if "id" in meta else zlib.crc32(self.slug.encode())
+        self.title = meta.get("title", self.slug)
+        self.author = meta.get("author", "")
+        self.date = meta.get("date") or date.fromtimestamp(mtime_ns / 1e9).isoformat()
+        self.category = meta.get("category", "")
+        self.path = path
+        self.body_offset = body_offset
+        self.mtime_ns = mtime_ns
+
+    @property
+    def content(self) -> str:
+        return _read_body(self.path, self.body_offset, self.mtime_ns)
+
+    def to_full(self) -> PostFull:
+        return PostFull(
+            id=self.id, title=self.title, slug=self.slug, author=self.author,
+            date=self.date, category=self.category, content=self.content,
+        )
+
+
+def read_header(path: str) -> Tuple[Dict[str, str], int]:
+    # Reads only the front matter block and returns it with the byte offset of the body.
+    meta: Dict[str, str] = {}
+    with open(path, "rb") as f:
+        if f.readline().strip() != FRONT_MATTER:
+            return meta, 0
+        for line in f:
+            if line.strip() == FRONT_MATTER:
+                return meta, f.tell()
+            key, sep, value = line.decode("utf-8").partition(":")
+            if sep:
+                meta[key.strip()] = value.strip().strip("\"'")
+    raise ValueError(f"{path}: front matter is not closed")
+
+
+class ContentSource:
+    # Indexes a directory of Markdown files into a PostRepository and polls it
+    # for changes; only files whose mtime or size changed are re-read. When two
+    # files share a slug the first one seen serves it and the other is logged.
+
+    def __init__(self, directory: str, repo: PostRepository, poll_interval: float = POLL_INTERVAL):
+        self.directory = directory
+        self.repo = repo
+        self.poll_interval = poll_interval
+        self._files: Dict[str, Tuple[int, int, Optional[str]]] = {}
+        self._owners: Dict[str, str] = {}  # slug -> path of the file serving it
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def scan(self) -> Tuple[int, int]:
+        seen = set()
+        changed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".md") or not entry.is_file():
+                    continue
+                seen.add(entry.path)
+                stat = entry.stat()
+                known = self._files.get(entry.path)
+                if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                if self._load(entry.path, stat):
+                    changed += 1
+        removed = [path for path in self._files if path not in seen]
+        for path in removed:
+            self._release(path, self._files.pop(path)[2])
+        return changed, len(removed)
+
+    def _load(self, path: str, stat: os.stat_result) -> bool:
+        known = self._files.get(path)
+        try:
+            meta, offset = read_header(path)
+            # a bad header value (e.g. "id: abc") skips the file, not the scan
+            post = FilePost(path, offset, stat.st_mtime_ns, meta)
+        except (OSError, UnicodeDecodeError, ValueError) as exc:
+            print(f"Skipping {path}: {exc}")
+            # remembered with no slug, so it is only retried once it changes
+            self._files[path] = (stat.st_mtime_ns, stat.st_size, None)
+            if known is not None:
+                self._release(path, known[2])
+            return False
+        if known is not None and known[2] != post.slug:
+            self._release(path, known[2])
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, post.slug)
+        owner = self._owners.get(post.slug)
+        if owner is not None and owner != path:
+            # first file to claim a slug keeps it; this one waits in _files
+            # and takes over if the owner goes away
+            print(f"Skipping {path}: slug {post.slug!r} is already used by {owner}")
+            return False
+        self._owners[post.slug] = path
+        self.repo.upsert(post)
+        return True
+
+    def _release(self, path: str, slug: Optional[str]):
+        # path no longer provides slug: hand it to a duplicate or drop the post
+        if slug is None or self._owners.get(slug) != path:
+            return
+        del self._owners[slug]
+        candidates = [other for other, known in self._files.items() if other != path and known[2] == slug]
+        for other in candidates:
+            try:
+                stat = os.stat(other)
+            except OSError:
+                continue  # deleted in this same pass
+            if self._load(other, stat):
+                return
+        self.repo.remove(slug)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.scan()
+            except (OSError, ValueError) as exc:
+                # keep polling: a failed pass must not end hot reload
+                print(f"Content scan failed: {exc}")
+
+    def start(self):
+        self.scan()
+        if self.poll_interval > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="content-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
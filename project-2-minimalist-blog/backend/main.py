@@ -1,9 +1,25 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
-app = FastAPI()
+from content import ContentSource
+from models import PostBase, PostFull
+from render import RenderCache, content_hash, etag_for, etag_matches
+from repository import SUMMARY_FIELDS, PostRepository
+from search import RepositoryIndexer, SearchIndex
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    indexer.start()
+    content_source.start()
+    yield
+    content_source.stop()
+    indexer.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
@@ -16,89 +32,71 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
-# --- Models ---
-class PostBase(BaseModel):
-    id: int
-    title: str
-    slug: str
-    author: str
-    date: str
-    category: str
-
-class PostFull(PostBase):
-    content: str
-
-# --- Fake DB ---
-fake_posts_db: List[PostFull] = [
-    PostFull(
-        id=1,
-        slug="first-post",
-        title="Мой первый пост",
-        content="""## Бұл менің бірінші постым
-
-**Бұл блог** веб-даму туралы.
-
-- HTML
-- CSS
-- JavaScript
-
-Көбірек білу үшін [осында бас](https://developer.mozilla.org/).""",
-        author="Bigazy",
-        date="2025-07-10",
-        category="Жаңалықтар"
-    ),
-    PostFull(
-        id=2,
-        slug="fastapi-and-nextjs",
-        title="FastAPI + Next.js = ❤️",
-        content="""### FastAPI + Next.js = 💥
-
-FastAPI — Python негізіндегі заманауи backend фреймворк.
-
-Next.js — React-пен жасалған қуатты frontend фреймворк.
-
-**Біріктірсең:** толық стек қосымша шығады!
-
-```bash
-uvicorn main:app --reload
-npm run dev
-```""",
-        author="Bigazy",
-        date="2025-07-10",
-        category="Веб-даму"
-    ),
-    PostFull(
-        id=3,
-        slug="why-i-love-python",
-        title="Почему я люблю Python",
-        content="""## Неліктен мен Python тілін жақсы көрем
-
-Python тілі:
-
-- **Оқуға жеңіл**
-- Көп салаларда қолданылады: *backend, data science, AI*
-- Үлкен қауымдастық пен кітапханалар бар
-
-> "Simple is better than complex." — Zen of Python""",
-        author="Bigazy",
-        date="2025-07-10",
-        category="Бағдарламалау"
-    )
-]
+# --- Content ---
+CONTENT_DIR = os.getenv("BLOG_CONTENT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "posts"))
 
+posts_repo = PostRepository()
+search_index = SearchIndex()
+indexer = RepositoryIndexer(search_index)
+posts_repo.subscribe(indexer)
+content_source = ContentSource(CONTENT_DIR, posts_repo)
 
 @app.get("/api/posts", response_model=List[PostBase])
-async def get_all_posts():
-    return fake_posts_db
+async def get_all_posts(
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+):
+    try:
+        body, next_cursor = posts_repo.page(limit=limit, cursor=cursor, category=category)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/api/posts/{slug}", response_model=PostFull)
 async def get_post_by_slug(slug: str):
-    for post in fake_posts_db:
-        if post.slug == slug:
-            return post
-    raise HTTPException(status_code=404, detail="Post not found")
+    post = posts_repo.get(slug)
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return post.to_full()
+
+# --- Search ---
+@app.get("/api/search")
+async def search_posts(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(10, ge=1, le=50)):
+    # in a thread: the index lock is shared with the indexer thread's writes
+    results = []
+    for slug, score in await asyncio.to_thread(search_index.search, q, limit):
+        post = posts_repo.get(slug)
+        if post is not None:
+            hit = {field: getattr(post, field) for field in SUMMARY_FIELDS}
+            hit["score"] = round(score, 4)
+            results.append(hit)
+    return results
+
+# --- Rendered HTML ---
+render_cache = RenderCache()
+
+@app.get("/api/posts/{slug}/html")
+async def get_post_html(
+    slug: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: str = Header(""),
+):
+    post = await get_post_by_slug(slug)
+    key = content_hash(post.content)
+    headers = {"ETag": etag_for(key), "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    # Markdown, nh3 and the compressors take tens of ms for a long post: keep them off the loop
+    rendered = render_cache.get(key) or await asyncio.to_thread(render_cache.render, post.content, key)
+    body, encoding = rendered.body_for(accept_encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="text/html; charset=utf-8", headers=headers)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+# --- Models ---
+class PostBase(BaseModel):
+    id: int
+    title: str
+    slug: str
+    author: str
+    date: str
+    category: str
+
+class PostFull(PostBase):
+    content: str
@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import markdown
+import nh3
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Bump when the Markdown extensions or the sanitizer rules change,
+# so cached HTML and ETags from the old pipeline are not reused.
+RENDERER_VERSION = "1"
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+ALLOWED_TAGS = {
+    "a", "blockquote", "br", "code", "del", "em", "h1", "h2", "h3", "h4", "h5", "h6",
+    "hr", "img", "li", "ol", "p", "pre", "strong", "table", "tbody", "td", "th",
+    "thead", "tr", "ul",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title"},
+    "code": {"class"},
+}
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class RenderedPost:
+    __slots__ = ("etag", "html", "gzip", "br", "size")
+
+    def __init__(self, etag: str, html: bytes):
+        self.etag = etag
+        self.html = html
+        self.gzip = gzip.compress(html, compresslevel=9, mtime=0)
+        self.br = brotli.compress(html, quality=11) if brotli else None
+        self.size = len(self.html) + len(self.gzip) + (len(self.br) if self.br else 0)
+
+    def body_for(self, accept_encoding: str):
+        # Returns (body, content-encoding or None), preferring the smallest variant.
+        encodings = {e.split(";")[0].strip().lower() for e in accept_encoding.split(",")}
+        if self.br is not None and "br" in encodings:
+            return self.br, "br"
+        if "gzip" in encodings:
+            return self.gzip, "gzip"
+        return self.html, None
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(f"{RENDERER_VERSION}\0{content}".encode()).hexdigest()
+
+
+def etag_for(key: str) -> str:
+    # Known from the content hash alone, so a 304 never needs a render
+    return f'"{key[:32]}"'
+
+
+def render_markdown(content: str) -> str:
+    html = markdown.markdown(content, extensions=MARKDOWN_EXTENSIONS)
+    return nh3.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
+
+class RenderCache:
+    # LRU of rendered posts keyed by content hash and bounded by the total
+    # size of the stored variants rather than by entry count.
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, RenderedPost]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[RenderedPost]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: RenderedPost):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def render(self, content: str, key: Optional[str] = None) -> RenderedPost:
+        key = content_hash(content) if key is None else key
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            self.misses += 1
+        entry = RenderedPost(etag_for(key), render_markdown(content).encode())
+        self.put(key, entry)
+        return entry
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (t.strip() for t in if_none_match.split(","))
+    return any(t[2:] == etag if t.startswith("W/") else t == etag for t in tags)
@@ -0,0 +1,131 @@
+import base64
+import json
+import threading
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+SUMMARY_FIELDS = ("id", "title", "slug", "author", "date", "category")
+
+# (date, id, slug): ISO dates sort lexicographically, id breaks ties and the
+# slug makes the key unique (a copied file keeps its id and date)
+SortKey = Tuple[str, int, str]
+
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode("|".join(map(str, key)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    try:
+        raw = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode()).decode()
+        date, post_id, *slug = raw.split("|", 2)
+        # two-part cursors from before the slug was added sort before the whole (date, id) group
+        return date, int(post_id), slug[0] if slug else ""
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+class PostRepository:
+    # Posts indexed by slug and by category, with sort keys kept in ascending
+    # order so newest-first pages are a bisect plus a reverse slice. Each
+    # post's summary is serialized to JSON once, and the full listing is
+    # cached until the next write.
+
+    def __init__(self, posts: Iterable = ()):
+        self._by_slug: Dict[str, object] = {}
+        self._by_key: Dict[SortKey, object] = {}
+        self._summary_json: Dict[SortKey, bytes] = {}
+        self._keys: List[SortKey] = []
+        self._keys_by_category: Dict[str, List[SortKey]] = {}
+        self._all_json: Optional[bytes] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str, object], None]] = []
+        for post in posts:
+            self.upsert(post)
+
+    @staticmethod
+    def _key(post) -> SortKey:
+        return post.date, post.id, post.slug
+
+    def __len__(self) -> int:
+        return len(self._by_slug)
+
+    def get(self, slug: str):
+        return self._by_slug.get(slug)
+
+    def categories(self) -> List[str]:
+        return sorted(self._keys_by_category)
+
+    def subscribe(self, listener: Callable[[str, object], None]):
+        # listener(event, post) is called with "upsert" or "remove" after each write
+        self._listeners.append(listener)
+        for post in list(self._by_slug.values()):
+            listener("upsert", post)
+
+    def _notify(self, event: str, post):
+        for listener in self._listeners:
+            listener(event, post)
+
+    def upsert(self, post):
+        with self._lock:
+            existing = self._by_slug.get(post.slug)
+            if existing is not None:
+                self._remove(existing)
+            key = self._key(post)
+            self._by_slug[post.slug] = post
+            self._by_key[key] = post
+            self._summary_json[key] = json.dumps(
+                {field: getattr(post, field) for field in SUMMARY_FIELDS},
+                ensure_ascii=False,
+            ).encode()
+            insort(self._keys, key)
+            insort(self._keys_by_category.setdefault(post.category, []), key)
+            self._all_json = None
+        self._notify("upsert", post)
+
+    def remove(self, slug: str) -> bool:
+        with self._lock:
+            post = self._by_slug.get(slug)
+            if post is None:
+                return False
+            self._remove(post)
+            self._all_json = None
+        self._notify("remove", post)
+        return True
+
+    def _remove(self, post):
+        key = self._key(post)
+        del self._by_slug[post.slug]
+        del self._by_key[key]
+        del self._summary_json[key]
+        self._keys.pop(bisect_left(self._keys, key))
+        category_keys = self._keys_by_category[post.category]
+        category_keys.pop(bisect_left(category_keys, key))
+        if not category_keys:
+            del self._keys_by_category[post.category]
+
+    def page(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+             category: Optional[str] = None) -> Tuple[bytes, Optional[str]]:
+        # Returns the serialized JSON array of summaries (newest first) and the
+        # cursor of the next page, if any.
+        if limit is None and cursor is None and category is None:
+            return self.all_json(), None
+        after = decode_cursor(cursor) if cursor is not None else None
+        with self._lock:
+            keys = self._keys if category is None else self._keys_by_category.get(category, [])
+            end = len(keys) if after is None else bisect_left(keys, after)
+            start = 0 if limit is None else max(0, end - limit)
+            page_keys = keys[start:end][::-1]
+            next_cursor = encode_cursor(page_keys[-1]) if start > 0 and page_keys else None
+            return self._join(page_keys), next_cursor
+
+    def all_json(self) -> bytes:
+        cached = self._all_json
+        if cached is None:
+            with self._lock:
+                cached = self._all_json = self._join(self._keys[::-1])
+        return cached
+
+    def _join(self, keys: List[SortKey]) -> bytes:
+        return b"[" + b",".join(self._summary_json[key] for key in keys) + b"]"
@@ -0,0 +1,296 @@
+import heapq
+import math
+import queue
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# \w is Unicode-aware, so Cyrillic, Kazakh-specific letters (ә ғ қ ң ө ұ ү һ і)
+# and Latin all tokenize the same way.
+TOKEN_RE = re.compile(r"\w+")
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "content": 1.0}
+K1 = 1.2
+B = 0.75
+MAX_PREFIX_TERMS = 64
+PREFIX_WEIGHT = 0.9
+# Cached scores use a snapshot of the doc count and average length; all of
+# them are rebuilt once either drifts this far (relative) from the snapshot
+STATS_DRIFT = 0.01
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(normalize(text))
+
+
+class SearchIndex:
+    # Inverted index with BM25 ranking. Field weights are folded into term
+    # frequencies (a simplified BM25F), so one posting list serves all fields.
+    # Per-term score lists are cached so repeated queries only walk the head
+    # of each list. A write evicts only the terms whose postings it changed
+    # (and the prefixes covering them); idf and length normalization come
+    # from a stats snapshot that is refreshed, with a full eviction, only
+    # after STATS_DRIFT of change, so cached and fresh lists stay comparable.
+
+    def __init__(self, field_weights: Dict[str, float] = FIELD_WEIGHTS):
+        self.field_weights = field_weights
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._total_len = 0.0
+        self._sorted_terms: Optional[List[str]] = None
+        # term -> (doc -> BM25 contribution, same pairs sorted by contribution);
+        # prefix -> the same for the prefix as a virtual term. Built on demand.
+        self._impacts: Dict[str, Tuple[Dict[str, float], List[Tuple[str, float]]]] = {}
+        self._prefix_impacts: Dict[str, Tuple[Dict[str, float], List[Tuple[str, float]]]] = {}
+        self._stats: Optional[Tuple[int, float]] = None  # (doc count, avgdl) used for scoring
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, doc_id: str, fields: Dict[str, str]):
+        tf: Counter = Counter()
+        for field, weight in self.field_weights.items():
+            for token in tokenize(fields.get(field) or ""):
+                tf[token] += weight
+        with self._lock:
+            touched = self._remove(doc_id)
+            for term, freq in tf.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._sorted_terms = None
+                postings[doc_id] = freq
+            self._doc_terms[doc_id] = dict(tf)
+            length = sum(tf.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+            self._invalidate(doc_id, [*touched, *tf])
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._invalidate(doc_id, self._remove(doc_id))
+
+    def _invalidate(self, doc_id: str, terms):
+        # Called after a write to doc_id changed the postings of `terms`
+        stats = self._stats
+        if stats is not None:
+            n = len(self._doc_len)
+            avgdl = self._total_len / n if n else 0.0
+            if abs(n - stats[0]) > STATS_DRIFT * stats[0] or abs(avgdl - stats[1]) > STATS_DRIFT * stats[1]:
+                self._stats = None
+                self._impacts = {}
+                self._prefix_impacts = {}
+                return
+        prefix_impacts = self._prefix_impacts
+        for term in terms:
+            self._update_impact(term, doc_id)
+            if prefix_impacts:
+                for end in range(1, len(term) + 1):
+                    prefix_impacts.pop(term[:end], None)
+
+    def _update_impact(self, term: str, doc_id: str):
+        # Patches one doc's entry in a cached score list instead of rebuilding
+        # it; the list keeps the idf it was built with until the term's doc
+        # frequency drifts past STATS_DRIFT.
+        cached = self._impacts.get(term)
+        if cached is None:
+            return
+        scores, ranked, idf, df = cached
+        postings = self._postings.get(term)
+        if not postings or abs(len(postings) - df) > STATS_DRIFT * df:
+            del self._impacts[term]
+            return
+        old = scores.pop(doc_id, None)
+        if old is not None:
+            i = bisect_left(ranked, -old, key=_neg_score)
+            while ranked[i][0] != doc_id:
+                i += 1
+            del ranked[i]
+        tf = postings.get(doc_id)
+        if tf is not None:
+            score = scores[doc_id] = self._score(idf, tf, doc_id)
+            ranked.insert(bisect_left(ranked, -score, key=_neg_score), (doc_id, score))
+
+    def _score(self, idf: float, tf: float, doc_id: str) -> float:
+        return idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * self._doc_len[doc_id] / self._stats[1]))
+
+    def _remove(self, doc_id: str):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return ()
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                self._sorted_terms = None
+        self._total_len -= self._doc_len.pop(doc_id)
+        return terms
+
+    def expand_prefix(self, prefix: str, limit: int = MAX_PREFIX_TERMS) -> List[str]:
+        terms = self._sorted_terms
+        if terms is None:
+            terms = self._sorted_terms = sorted(self._postings)
+        start = bisect_left(terms, prefix)
+        expanded = []
+        for term in terms[start:start + limit]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
+
+    def _query_terms(self, query: str) -> List[Tuple[str, bool]]:
+        # (token, is_prefix); a trailing "*" marks the last token of a word as a prefix
+        terms = []
+        for raw in query.split():
+            prefix = raw.endswith("*")
+            tokens = tokenize(raw)
+            for i, token in enumerate(tokens):
+                terms.append((token, prefix and i == len(tokens) - 1))
+        return terms
+
+    def _impact(self, term: str):
+        cached = self._impacts.get(term)
+        if cached is not None:
+            return cached
+        postings = self._postings.get(term)
+        if not postings:
+            return None
+        if self._stats is None:
+            self._stats = (len(self._doc_len), self._total_len / len(self._doc_len))
+        n = self._stats[0]
+        df = len(postings)
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        score = self._score
+        scores = {doc_id: score(idf, tf, doc_id) for doc_id, tf in postings.items()}
+        cached = self._impacts[term] = (scores, sorted(scores.items(), key=_neg_score), idf, df)
+        return cached
+
+    def _prefix_impact(self, prefix: str):
+        # A prefix acts as one virtual term: each doc gets its best-matching
+        # expansion, down-weighted a little so exact matches rank first.
+        cached = self._prefix_impacts.get(prefix)
+        if cached is not None:
+            return cached
+        scores: Dict[str, float] = {}
+        for term in self.expand_prefix(prefix):
+            for doc_id, score in self._impact(term)[0].items():
+                score *= PREFIX_WEIGHT
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+        if not scores:
+            return None
+        cached = self._prefix_impacts[prefix] = (scores, sorted(scores.items(), key=_neg_score))
+        return cached
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        with self._lock:
+            lists = []
+            for token, is_prefix in self._query_terms(query):
+                impact = self._prefix_impact(token) if is_prefix else self._impact(token)
+                if impact is not None:
+                    lists.append(impact[:2])
+            return _top_k(lists, limit)
+
+
+def _neg_score(item: Tuple[str, float]) -> float:
+    return -item[1]
+
+
+def _top_k(lists, k: int) -> List[Tuple[str, float]]:
+    # Threshold algorithm over per-term lists sorted by contribution: walk all
+    # lists in step, score each newly seen doc fully, and stop once the k-th
+    # best score beats the best any unseen doc could still reach. This is the
+    # hot loop of a warm query, hence the bound methods and the cached floor.
+    if not lists:
+        return []
+    if len(lists) == 1:
+        return lists[0][1][:k]
+    gets = [scores.get for scores, _ in lists]
+    rankeds = [ranked for _, ranked in lists]
+    best: List[Tuple[float, str]] = []
+    floor = 0.0  # k-th best total once best is full
+    seen = set()
+    seen_add = seen.add
+    for depth in range(max(len(ranked) for ranked in rankeds)):
+        threshold = 0.0
+        for ranked in rankeds:
+            if depth >= len(ranked):
+                continue
+            doc_id, score = ranked[depth]
+            threshold += score
+            if doc_id in seen:
+                continue
+            seen_add(doc_id)
+            total = 0.0
+            for get in gets:
+                total += get(doc_id, 0.0)
+            if len(best) < k:
+                heapq.heappush(best, (total, doc_id))
+                if len(best) == k:
+                    floor = best[0][0]
+            elif total > floor:
+                heapq.heapreplace(best, (total, doc_id))
+                floor = best[0][0]
+        if len(best) == k and floor >= threshold:
+            break
+    return [(doc_id, score) for score, doc_id in sorted(best, reverse=True)]
+
+
+def post_fields(post) -> Dict[str, str]:
+    # Reads the body (through the bounded body cache); only called on the
+    # indexer thread, so startup itself still reads headers only
+    return {"title": post.title, "category": post.category, "content": post.content}
+
+
+class RepositoryIndexer:
+    # Keeps a SearchIndex in step with a PostRepository through its listeners.
+    # Events are queued and applied in order by a background thread, so
+    # neither startup nor the content watcher waits for bodies to be read and
+    # tokenized. Until the queue drains, search sees the older index.
+
+    def __init__(self, index: SearchIndex):
+        self.index = index
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def __call__(self, event: str, post):
+        self._queue.put((event, post))
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            event, post = item
+            try:
+                if event == "upsert":
+                    self.index.add(post.slug, post_fields(post))
+                elif event == "remove":
+                    self.index.remove(post.slug)
+            except (OSError, UnicodeDecodeError) as exc:
+                # the file changed or went away since; its next event fixes it
+                print(f"Indexing {post.slug} failed: {exc}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="search-indexer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
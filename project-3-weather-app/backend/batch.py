@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Tuple, Union
+
+from upstream import UpstreamError, WeatherClient, normalize_city
+
+MAX_BATCH_CITIES = 100
+BATCH_CONCURRENCY = 8
+# the upstream group endpoint accepts at most 20 city ids per call
+GROUP_SIZE = 20
+
+BatchResult = Tuple[str, Union[Dict[str, Any], UpstreamError]]
+
+
+def parse_cities(raw: List[str]) -> List[str]:
+    # Accepts repeated values and comma-separated lists; drops blanks and
+    # duplicates (by normalized name) while keeping the caller's order.
+    cities = []
+    seen = set()
+    for value in raw:
+        for city in value.split(","):
+            city = " ".join(city.split())
+            key = normalize_city(city)
+            if city and key not in seen:
+                seen.add(key)
+                cities.append(city)
+    return cities
+
+
+async def iter_batch(client: WeatherClient, cities: List[str],
+                     concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[BatchResult]:
+    # Yields (city, payload or UpstreamError) as each city resolves. Cities
+    # with a known upstream id that are not fresh in the cache are fetched
+    # through the group endpoint; everything else goes through the regular
+    # cached single-city path. At most `concurrency` upstream calls run at once.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(city: str) -> List[BatchResult]:
+        try:
+            async with semaphore:
+                return [(city, await client.current(city=city))]
+        except UpstreamError as exc:
+            return [(city, exc)]
+
+    async def group(chunk: List[str]) -> List[BatchResult]:
+        try:
+            async with semaphore:
+                found = await client.current_group(chunk)
+        except UpstreamError:
+            found = {}
+        results = [(city, found[city]) for city in chunk if city in found]
+        # ids the group call did not return fall back to single lookups
+        for city in chunk:
+            if city not in found:
+                results.extend(await one(city))
+        return results
+
+    grouped = [city for city in cities if client.group_eligible(city)]
+    grouped_set = set(grouped)
+    tasks = [asyncio.ensure_future(group(grouped[i:i + GROUP_SIZE]))
+             for i in range(0, len(grouped), GROUP_SIZE)]
+    tasks += [asyncio.ensure_future(one(city)) for city in cities if city not in grouped_set]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for result in await next_done:
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
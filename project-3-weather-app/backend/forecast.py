@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+# OpenWeatherMap condition group (id // 100) -> severity; 800 (clear) is
+# ranked on its own below the other 8xx (clouds)
+SEVERITY = {2: 6, 6: 5, 5: 4, 3: 3, 7: 2, 8: 1}
+CLEAR = 800
+
+
+def severity(condition: np.ndarray) -> np.ndarray:
+    # Sort key for weather ids: the group's severity, then the id itself,
+    # which grows with intensity inside a group
+    rank = np.zeros(len(condition), dtype=np.int64)
+    for group, level in SEVERITY.items():
+        rank[condition // 100 == group] = level
+    rank[condition == CLEAR] = 0
+    return rank * 1000 + condition
+
+
+def to_columns(items: List[Dict[str, Any]]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    # The 3-hourly series as one array per field sorted by time, plus the
+    # permutation that maps sorted positions back to `items`
+    n = len(items)
+    dt = np.fromiter((item["dt"] for item in items), dtype=np.int64, count=n)
+    order = np.argsort(dt, kind="stable")
+    main = [item["main"] for item in items]
+    columns = {
+        "dt": dt,
+        "temp": np.fromiter((m["temp"] for m in main), dtype=np.float64, count=n),
+        "temp_min": np.fromiter((m.get("temp_min", m["temp"]) for m in main), dtype=np.float64, count=n),
+        "temp_max": np.fromiter((m.get("temp_max", m["temp"]) for m in main), dtype=np.float64, count=n),
+        # rain and snow are reported as volume over the last 3 hours, in mm
+        "precipitation": np.fromiter(
+            ((item.get("rain") or {}).get("3h", 0.0) + (item.get("snow") or {}).get("3h", 0.0)
+             for item in items),
+            dtype=np.float64, count=n,
+        ),
+        "condition": np.fromiter((item["weather"][0]["id"] for item in items), dtype=np.int64, count=n),
+        "daytime": np.fromiter((item["weather"][0]["icon"].endswith("d") for item in items), dtype=bool, count=n),
+    }
+    return {name: column[order] for name, column in columns.items()}, order
+
+
+def daily_summary(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Groups the series into local calendar days using the city's UTC offset
+    # and reduces every column per day in one pass over the arrays.
+    items = data.get("list") or []
+    if not items:
+        return []
+    cols, order = to_columns(items)
+    offset = int((data.get("city") or {}).get("timezone", 0))
+    day = (cols["dt"] + offset) // SECONDS_PER_DAY
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    counts = np.diff(np.r_[starts, len(day)])
+    day_index = np.repeat(np.arange(len(starts)), counts)
+
+    temp_min = np.minimum.reduceat(cols["temp_min"], starts)
+    temp_max = np.maximum.reduceat(cols["temp_max"], starts)
+    temp_mean = np.add.reduceat(cols["temp"], starts) / counts
+    precipitation = np.add.reduceat(cols["precipitation"], starts)
+
+    # dominant condition: most frequent weather id per day, ties go to the
+    # more severe one; its first daytime occurrence (or, failing that, its
+    # first occurrence) supplies description and icon
+    codes, code_index = np.unique(severity(cols["condition"]), return_inverse=True)
+    pair = day_index * len(codes) + code_index
+    tally = np.bincount(pair, minlength=len(starts) * len(codes)).reshape(len(starts), len(codes))
+    dominant = np.arange(len(starts)) * len(codes) + len(codes) - 1 - tally[:, ::-1].argmax(axis=1)
+    first_pair, first_at = np.unique(pair, return_index=True)
+    first = first_at[np.searchsorted(first_pair, dominant)]
+    daytime = np.flatnonzero(cols["daytime"])
+    day_pair, day_at = np.unique(pair[daytime], return_index=True)
+    found = np.searchsorted(day_pair, dominant)
+    found = np.minimum(found, max(len(day_pair) - 1, 0))
+    if len(day_pair):
+        has_day = day_pair[found] == dominant
+        first = np.where(has_day, daytime[day_at[found]], first)
+
+    result = []
+    for i in range(len(starts)):
+        weather = items[order[first[i]]]["weather"][0]
+        result.append({
+            "date": datetime.fromtimestamp(int(day[starts[i]]) * SECONDS_PER_DAY, timezone.utc).date().isoformat(),
+            "temperature": round(float(temp_mean[i]), 1),
+            "temp_min": round(float(temp_min[i]), 1),
+            "temp_max": round(float(temp_max[i]), 1),
+            "precipitation": round(float(precipitation[i]), 1),
+            "description": weather["description"],
+            "icon": weather["icon"],
+            "samples": int(counts[i]),
+        })
+    return result
+
+
+def with_daily_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Cache processor: the derived summary is stored next to the raw payload,
+    # so it is computed once per upstream load rather than once per view
+    return {**data, "daily": daily_summary(data)}
@@ -1,12 +1,57 @@
+import json
 import os
-import httpx
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from batch import MAX_BATCH_CITIES, iter_batch, parse_cities
+from forecast import with_daily_summary
+from tiles import TilePrefetcher
+from upstream import DEFAULT_BASE_URL, TTLCache, UpstreamError, WeatherClient
 
 load_dotenv()
 
-app = FastAPI()
+# --- OpenWeatherMap API кілті ---
+API_KEY = os.getenv("OPENWEATHER_API_KEY")
+# Тест үшін жергілікті stub-серверге бағыттауға болады
+BASE_URL = os.getenv("OPENWEATHER_BASE_URL", DEFAULT_BASE_URL)
+CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "300"))
+NEGATIVE_TTL = float(os.getenv("WEATHER_NEGATIVE_TTL", "60"))
+# Координаттар geohash ұяшығына дейін дөңгелектенеді (5 ≈ 4.9 км)
+TILE_PRECISION = int(os.getenv("WEATHER_TILE_PRECISION", "5"))
+PREFETCH_TOP_N = int(os.getenv("WEATHER_PREFETCH_TOP_N", "20"))
+PREFETCH_INTERVAL = float(os.getenv("WEATHER_PREFETCH_INTERVAL", "60"))
+BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "8"))
+
+weather = WeatherClient(
+    API_KEY, BASE_URL,
+    cache=TTLCache(ttl=CACHE_TTL, stale_ttl=STALE_TTL),
+    negative_ttl=NEGATIVE_TTL,
+    tile_precision=TILE_PRECISION,
+    # Болжамның күндік қорытындысы бір рет есептеліп, кэште бірге сақталады
+    processors={"forecast": with_daily_summary},
+)
+prefetcher = TilePrefetcher(weather, top_n=PREFETCH_TOP_N, interval=PREFETCH_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Бір ортақ HTTP клиент: байланыстар пулда қайта қолданылады
+    await weather.start()
+    # Ең көп сұралатын ұяшықтарды фонда жаңартып отыру
+    prefetcher.start()
+    yield
+    await prefetcher.stop()
+    await weather.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS Рұқсаттары ---
 origins = ["http://localhost:3000"]
@@ -18,135 +63,107 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- OpenWeatherMap API кілті ---
-API_KEY = os.getenv("OPENWEATHER_API_KEY")
-CURRENT_URL = "https://api.openweathermap.org/data/2.5/weather"
-FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
-ONECALL_URL = "https://api.openweathermap.org/data/3.0/onecall"
-
-# --- 1. Қала аты арқылы ауа райын алу ---
-@app.get("/api/weather/{city}")
-async def get_weather(city: str):
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="API кілті табылмады")
-
-    params = {
-        "q": city,
-        "appid": API_KEY,
-        "units": "metric",
-        "lang": "ru"
-    }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(CURRENT_URL, params=params)
+async def fetch_or_raise(coro):
+    try:
+        return await coro
+    except UpstreamError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
 
-    if response.status_code != 200:
-        raise HTTPException(status_code=response.status_code, detail=response.json().get("message", "Қате"))
 
-    data = response.json()
+def current_summary(data: dict) -> dict:
     return {
-        "city": data["name"],
+        "city": data.get("name", "Белгісіз"),  # 'Белгісіз' деп fallback істейміз
         "temperature": data["main"]["temp"],
         "description": data["weather"][0]["description"],
         "icon": data["weather"][0]["icon"]
     }
 
-# --- 2. Геолокация (ендік, бойлық) арқылы ауа райы ---
-@app.get("/api/weather/coords")
-async def get_weather_by_coords(lat: float, lon: float):
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="API кілті табылмады")
-
-    params = {
-        "lat": lat,
-        "lon": lon,
-        "appid": API_KEY,
-        "units": "metric",
-        "lang": "ru"
-    }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(CURRENT_URL, params=params)
+class BatchRequest(BaseModel):
+    cities: List[str]
 
-    try:
-        data = response.json()
-    except Exception:
-        raise HTTPException(status_code=response.status_code, detail="Жауапты оқу мүмкін емес")
 
-    if response.status_code != 200:
-        raise HTTPException(status_code=response.status_code, detail=data.get("message", "Қате"))
+async def batch_response(raw_cities: List[str], stream: bool):
+    cities = parse_cities(raw_cities)
+    if not cities:
+        raise HTTPException(status_code=400, detail="Қалалар тізімі бос")
+    if len(cities) > MAX_BATCH_CITIES:
+        raise HTTPException(status_code=400, detail=f"Ең көбі {MAX_BATCH_CITIES} қала")
+
+    async def items():
+        # Әр қала дайын болған сәтте қайтарылады; қате тек сол қалаға қатысты
+        async for city, result in iter_batch(weather, cities, BATCH_CONCURRENCY):
+            if isinstance(result, UpstreamError):
+                yield {"query": city, "status": result.status_code, "detail": result.detail}
+            else:
+                yield {"query": city, "status": 200, "weather": current_summary(result)}
+
+    if stream:
+        async def ndjson():
+            async for item in items():
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    order = {city: i for i, city in enumerate(cities)}
+    results = sorted([item async for item in items()], key=lambda item: order[item["query"]])
+    return {"results": results}
+
+
+# --- 1. Геолокация (ендік, бойлық) арқылы ауа райы ---
+# /api/weather/{city} маршрутынан бұрын тіркелуі керек, әйтпесе "coords" қала аты ретінде ұсталады
+@app.get("/api/weather/coords")
+async def get_weather_by_coords(lat: float, lon: float):
+    data = await fetch_or_raise(weather.current(lat=lat, lon=lon))
+    return current_summary(data)
+
 
+@app.get("/api/weather/onecall")
+async def get_onecall(lat: float, lon: float):
+    data = await fetch_or_raise(weather.onecall(lat, lon))
     return {
-        "city": data.get("name", "Белгісіз"),  # 'Белгісіз' деп fallback істейміз
-        "temperature": data["main"]["temp"],
-        "description": data["weather"][0]["description"],
-        "icon": data["weather"][0]["icon"]
+        "temperature": data["current"]["temp"],
+        "description": data["current"]["weather"][0]["description"],
+        "icon": data["current"]["weather"][0]["icon"]
     }
 
 
-# --- 3. 5 күндік ауа райы болжамы ---
-@app.get("/api/forecast/{city}")
-async def get_forecast(city: str):
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="API кілті табылмады")
-
-    params = {
-        "q": city,
-        "appid": API_KEY,
-        "units": "metric",
-        "lang": "ru"
-    }
+# --- Бірнеше қаланың ауа райы бір сұраныспен ---
+# ?cities=Алматы,Астана немесе ?cities=Алматы&cities=Астана; stream=true болса NDJSON
+@app.get("/api/weather/batch")
+async def get_weather_batch(cities: List[str] = Query(...), stream: bool = False):
+    return await batch_response(cities, stream)
+
+
+@app.post("/api/weather/batch")
+async def post_weather_batch(request: BatchRequest, stream: bool = False):
+    return await batch_response(request.cities, stream)
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(FORECAST_URL, params=params)
 
-    if response.status_code != 200:
-        raise HTTPException(status_code=response.status_code, detail=response.json().get("message", "Қате"))
+# --- 2. Қала аты арқылы ауа райын алу ---
+@app.get("/api/weather/{city}")
+async def get_weather(city: str):
+    data = await fetch_or_raise(weather.current(city=city))
+    return current_summary(data)
 
-    data = response.json()
 
-    # Тек 12:00 уақыттағы күндізгі болжамдарды жинау
-    forecast_data = []
-    for item in data["list"]:
-        if "12:00:00" in item["dt_txt"]:
-            forecast_data.append({
-                "date": item["dt_txt"].split(" ")[0],
-                "temperature": item["main"]["temp"],
-                "description": item["weather"][0]["description"],
-                "icon": item["weather"][0]["icon"]
-            })
+# --- 3. 5 күндік ауа райы болжамы ---
+@app.get("/api/forecast/{city}")
+async def get_forecast(city: str):
+    data = await fetch_or_raise(weather.forecast(city))
 
+    # Қаланың уақыт белдеуі бойынша күндік мин/макс/орташа, жауын-шашын және басым құбылыс
     return {
         "city": data["city"]["name"],
-        "forecast": forecast_data
-    }
-
-@app.get("/api/weather/onecall")
-async def get_weather_by_coords(lat: float, lon: float):
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="API кілті табылмады")
-
-    params = {
-        "lat": lat,
-        "lon": lon,
-        "appid": API_KEY,
-        "units": "metric",
-        "lang": "ru",
-        "exclude": "minutely,hourly,daily,alerts"
+        "forecast": data["daily"]
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(ONECALL_URL, params=params)
 
-    if response.status_code != 200:
-        raise HTTPException(status_code=response.status_code, detail=response.text)
+# --- Кэш және upstream статистикасы ---
+@app.get("/api/metrics")
+async def get_metrics():
+    return weather.metrics()
 
-    data = response.json()
-    return {
-        "temperature": data["current"]["temp"],
-        "description": data["current"]["weather"][0]["description"],
-        "icon": data["current"]["weather"][0]["icon"]
-    }
 
 # --- Тест маршруты ---
 @app.get("/")
@@ -0,0 +1,126 @@
+import asyncio
+import math
+from typing import List, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# precision 5 is a ~4.9 x 4.9 km cell, about the grid size of the upstream model
+TILE_PRECISION = 5
+PREFETCH_TOP_N = 20
+PREFETCH_INTERVAL = 60.0
+MAX_HOT_CELLS = 50_000
+
+
+# --- Geohash ---
+def encode(lat: float, lon: float, precision: int = TILE_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, rng = (lon, lon_range) if even else (lat, lat_range)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            rng[0] = mid
+        else:
+            bits *= 2
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def bounds(cell: str) -> Tuple[float, float, float, float]:
+    # (lat_min, lat_max, lon_min, lon_max)
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in cell:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if bits >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def center(cell: str) -> Tuple[float, float]:
+    lat_min, lat_max, lon_min, lon_max = bounds(cell)
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+
+
+def neighbours_by_distance(cell: str, lat: float, lon: float) -> List[str]:
+    # The 8 surrounding cells, nearest to (lat, lon) first
+    lat_min, lat_max, lon_min, lon_max = bounds(cell)
+    c_lat, c_lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+    d_lat, d_lon = lat_max - lat_min, lon_max - lon_min
+    scale = math.cos(math.radians(lat))
+    found = []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            n_lat = c_lat + dy * d_lat
+            if (dx == 0 and dy == 0) or not -90 < n_lat < 90:
+                continue
+            n_lon = (c_lon + dx * d_lon + 180) % 360 - 180
+            distance = (n_lat - lat) ** 2 + ((n_lon - lon) * scale) ** 2
+            found.append((distance, encode(n_lat, n_lon, len(cell))))
+    return [neighbour for _, neighbour in sorted(found)]
+
+
+# --- Prefetcher ---
+class TilePrefetcher:
+    # Keeps the top_n most requested cells fresh so coordinate lookups for
+    # popular areas never wait for the upstream. Request counts are halved
+    # every round, so the ranking follows recent traffic.
+
+    def __init__(self, client, top_n: int = PREFETCH_TOP_N, interval: float = PREFETCH_INTERVAL):
+        self.client = client
+        self.top_n = top_n
+        self.interval = interval
+        self._task = None
+
+    async def run_once(self) -> int:
+        client = self.client
+        due = []
+        for (endpoint, cell), _ in client.heat.most_common(self.top_n):
+            params = client.tile_params(endpoint, cell)
+            # refresh anything that would expire before the next round
+            if client.cache.fresh_for(client.cache_key(endpoint, params)) < self.interval * 1.5:
+                due.append(client.refresh(endpoint, params))
+        await asyncio.gather(*due, return_exceptions=True)
+        self._decay()
+        return len(due)
+
+    def _decay(self):
+        heat = self.client.heat
+        for key, count in list(heat.items()):
+            if count > 1:
+                heat[key] = count // 2
+            else:
+                del heat[key]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as exc:
+                print(f"Tile prefetch failed: {exc}")
+
+    def start(self):
+        if self.top_n > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
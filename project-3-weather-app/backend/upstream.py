@@ -0,0 +1,327 @@
+import asyncio
+import importlib.util
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import httpx
+
+import tiles
+
+DEFAULT_BASE_URL = "https://api.openweathermap.org"
+ENDPOINTS = {
+    "current": "/data/2.5/weather",
+    "forecast": "/data/2.5/forecast",
+    "onecall": "/data/3.0/onecall",
+    "group": "/data/2.5/group",
+}
+# fixed extra parameters per endpoint, part of the cache key
+ENDPOINT_PARAMS = {
+    "onecall": {"exclude": "minutely,hourly,daily,alerts"},
+}
+CACHE_TTL = 600.0
+# how long an expired entry may still be served while it is refreshed in the background
+STALE_TTL = 300.0
+# "city not found" is cached briefly so typos and scanners do not reach the upstream
+NEGATIVE_TTL = 60.0
+CACHE_MAX_ENTRIES = 10_000
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE = 20
+TIMEOUT = 10.0
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def normalize_city(city: str) -> str:
+    return " ".join(city.split()).casefold()
+
+
+def city_params(city: str) -> Dict[str, Any]:
+    return {"q": normalize_city(city)}
+
+
+class TTLCache:
+    # LRU bounded by entry count. An entry is fresh for ttl seconds, then
+    # stale (still returned, flagged as such) for stale_ttl more seconds.
+
+    def __init__(self, ttl: float = CACHE_TTL, stale_ttl: float = STALE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        # Returns (value, is_fresh) or None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        fresh_until, stale_until, value = entry
+        now = time.monotonic()
+        if stale_until <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value, fresh_until > now
+
+    def fresh_for(self, key: Hashable) -> float:
+        # Seconds until the entry goes stale; 0 if it is missing or already stale
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, entry[0] - time.monotonic())
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            stale_ttl: Optional[float] = None):
+        fresh_until = time.monotonic() + (self.ttl if ttl is None else ttl)
+        stale_until = fresh_until + (self.stale_ttl if stale_ttl is None else stale_ttl)
+        self._entries[key] = (fresh_until, stale_until, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SingleFlight:
+    # Concurrent calls for the same key share one task. The task is shielded,
+    # so a cancelled caller does not cancel the load for everyone else.
+
+    def __init__(self):
+        self.coalesced = 0
+        self._tasks: Dict[Hashable, "asyncio.Task"] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    def spawn(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> "asyncio.Task":
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = self._tasks[key] = asyncio.ensure_future(load())
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return task
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.spawn(key, load))
+
+    async def cancel_all(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class WeatherClient:
+    # One pooled httpx.AsyncClient for the whole app plus a TTL cache of
+    # upstream payloads. Concurrent misses for the same key share a single
+    # upstream call, stale entries are served while a background refresh
+    # runs, and 404s are cached for a short time. Coordinates are snapped to
+    # geohash cells, so nearby users share entries. The transport can be
+    # swapped out so the client can be pointed at a stub server or an
+    # httpx.MockTransport.
+
+    def __init__(self, api_key: Optional[str], base_url: str = DEFAULT_BASE_URL,
+                 units: str = "metric", lang: str = "ru",
+                 cache: Optional[TTLCache] = None, negative_ttl: float = NEGATIVE_TTL,
+                 tile_precision: int = tiles.TILE_PRECISION,
+                 processors: Optional[Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.units = units
+        self.lang = lang
+        self.cache = cache if cache is not None else TTLCache()
+        self.negative_ttl = negative_ttl
+        self.tile_precision = tile_precision
+        # endpoint -> function applied once per upstream load; its result is what gets cached
+        self.processors = processors or {}
+        # (endpoint, cell) -> recent request count, read by the tile prefetcher
+        self.heat: Counter = Counter()
+        # normalized city -> upstream city id, learned from responses; lets
+        # batch lookups use the group endpoint
+        self.city_ids: Dict[str, int] = {}
+        self.stats = {
+            "hits": 0, "stale_hits": 0, "negative_hits": 0, "neighbour_hits": 0, "misses": 0,
+            "refreshes": 0, "refresh_errors": 0, "prefetches": 0, "group_calls": 0,
+            "upstream_calls": 0, "upstream_errors": 0,
+        }
+        self._flight = SingleFlight()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                # HTTP/2 needs the optional h2 package (httpx[http2])
+                http2=self._transport is None and importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                    max_keepalive_connections=MAX_KEEPALIVE),
+                timeout=TIMEOUT,
+                transport=self._transport,
+            )
+
+    async def aclose(self):
+        await self._flight.cancel_all()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def cache_key(self, endpoint: str, params: Dict[str, Any]) -> Hashable:
+        return (endpoint, tuple(sorted(params.items())), self.units, self.lang)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "coalesced": self._flight.coalesced,
+            "in_flight": len(self._flight),
+            "cache_entries": len(self.cache),
+            "hot_cells": len(self.heat),
+        }
+
+    async def fetch(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        key = self.cache_key(endpoint, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            value, fresh = cached
+            if isinstance(value, UpstreamError):
+                self.stats["negative_hits"] += 1
+                raise UpstreamError(value.status_code, value.detail)
+            if fresh:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                self._refresh(key, endpoint, params)
+            return value
+        self.stats["misses"] += 1
+        return await self._flight.do(key, lambda: self._load(key, endpoint, params))
+
+    async def _load(self, key: Hashable, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            data = await self._request(endpoint, params)
+        except UpstreamError as exc:
+            if exc.status_code == 404:
+                self.cache.put(key, exc, ttl=self.negative_ttl, stale_ttl=0)
+            raise
+        process = self.processors.get(endpoint)
+        if process is not None:
+            data = process(data)
+        self.cache.put(key, data)
+        if endpoint == "current" and "q" in params and isinstance(data.get("id"), int):
+            self._remember_id(params["q"], data["id"])
+        return data
+
+    def _remember_id(self, city: str, city_id: int):
+        self.city_ids.pop(city, None)
+        self.city_ids[city] = city_id
+        if len(self.city_ids) > self.cache.max_entries:
+            del self.city_ids[next(iter(self.city_ids))]
+
+    def group_eligible(self, city: str) -> bool:
+        # True when the city's id is known and its cached entry is not fresh
+        params = city_params(city)
+        return (params["q"] in self.city_ids
+                and self.cache.fresh_for(self.cache_key("current", params)) <= 0)
+
+    async def current_group(self, cities: List[str]) -> Dict[str, Dict[str, Any]]:
+        # One upstream call for up to 20 cities with known ids. Each returned
+        # payload is cached under its city key; cities missing from the
+        # response are simply absent from the result.
+        by_id = {self.city_ids[normalize_city(city)]: city for city in cities}
+        self.stats["group_calls"] += 1
+        data = await self._request("group", {"id": ",".join(map(str, by_id))})
+        found = {}
+        for item in data.get("list", []):
+            city = by_id.get(item.get("id"))
+            if city is not None:
+                self.cache.put(self.cache_key("current", city_params(city)), item)
+                found[city] = item
+        return found
+
+    async def refresh(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Reloads an entry regardless of its freshness (used by the prefetcher)
+        key = self.cache_key(endpoint, params)
+        self.stats["prefetches"] += 1
+        return await self._flight.do(key, lambda: self._load(key, endpoint, params))
+
+    def _refresh(self, key: Hashable, endpoint: str, params: Dict[str, Any]):
+        # Fire-and-forget; stale hits that arrive while it runs do not start another
+        if self._flight.running(key):
+            return
+        self.stats["refreshes"] += 1
+        task = self._flight.spawn(key, lambda: self._load(key, endpoint, params))
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: "asyncio.Task"):
+        if not task.cancelled() and task.exception() is not None:
+            # the stale entry keeps being served until its stale window ends
+            self.stats["refresh_errors"] += 1
+
+    async def _request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.api_key:
+            raise UpstreamError(500, "API кілті табылмады")
+        if self._client is None:
+            await self.start()
+        query = {**params, "appid": self.api_key, "units": self.units, "lang": self.lang}
+        self.stats["upstream_calls"] += 1
+        try:
+            response = await self._client.get(ENDPOINTS[endpoint], params=query)
+        except httpx.HTTPError as exc:
+            self.stats["upstream_errors"] += 1
+            raise UpstreamError(502, f"Сервис қолжетімсіз: {exc.__class__.__name__}") from exc
+        try:
+            data = response.json()
+        except ValueError:
+            self.stats["upstream_errors"] += 1
+            raise UpstreamError(response.status_code, "Жауапты оқу мүмкін емес")
+        if response.status_code != 200:
+            self.stats["upstream_errors"] += 1
+            message = data.get("message", "Қате") if isinstance(data, dict) else "Қате"
+            raise UpstreamError(response.status_code, message)
+        return data
+
+    def tile_params(self, endpoint: str, cell: str) -> Dict[str, Any]:
+        lat, lon = tiles.center(cell)
+        return {"lat": round(lat, 4), "lon": round(lon, 4), **ENDPOINT_PARAMS.get(endpoint, {})}
+
+    async def by_coords(self, endpoint: str, lat: float, lon: float) -> Dict[str, Any]:
+        # Own cell if fresh, else the nearest fresh neighbour cell, else the
+        # regular fetch path (stale-while-revalidate, single-flight) for the own cell.
+        cell = tiles.encode(lat, lon, self.tile_precision)
+        self.heat[(endpoint, cell)] += 1
+        if len(self.heat) > tiles.MAX_HOT_CELLS:
+            self.heat = Counter(dict(self.heat.most_common(tiles.MAX_HOT_CELLS // 2)))
+        params = self.tile_params(endpoint, cell)
+        if self.cache.fresh_for(self.cache_key(endpoint, params)) <= 0:
+            for neighbour in tiles.neighbours_by_distance(cell, lat, lon):
+                cached = self.cache.get(self.cache_key(endpoint, self.tile_params(endpoint, neighbour)))
+                if cached is not None and cached[1] and not isinstance(cached[0], UpstreamError):
+                    self.stats["neighbour_hits"] += 1
+                    return cached[0]
+        return await self.fetch(endpoint, params)
+
+    async def current(self, city: Optional[str] = None, lat: Optional[float] = None,
+                      lon: Optional[float] = None) -> Dict[str, Any]:
+        if city is not None:
+            return await self.fetch("current", city_params(city))
+        return await self.by_coords("current", lat, lon)
+
+    async def forecast(self, city: str) -> Dict[str, Any]:
+        return await self.fetch("forecast", city_params(city))
+
+    async def onecall(self, lat: float, lon: float) -> Dict[str, Any]:
+        return await self.by_coords("onecall", lat, lon)
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import threading
+from typing import List
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+CODE_LENGTH = 6
+BLOCK_SIZE = int(os.getenv("SHORTENER_BLOCK_SIZE", "1000"))
+# Changing the key changes which code each counter value maps to; keep it
+# stable for the lifetime of a database
+SCRAMBLE_KEY = os.getenv("SHORTENER_CODE_KEY", "praktika-url-shortener")
+FEISTEL_ROUNDS = 4
+
+
+def base62(n: int, length: int = 0) -> str:
+    chars = []
+    while n:
+        n, r = divmod(n, 62)
+        chars.append(ALPHABET[r])
+    return "".join(reversed(chars)).rjust(length, ALPHABET[0]) or ALPHABET[0]
+
+
+class Scrambler:
+    # Keyed bijection on [0, 62**length): a balanced Feistel network over the
+    # smallest even number of bits that covers the range, with cycle-walking
+    # to map values that land outside it back in. Sequential counter values
+    # come out as unrelated-looking codes, and distinct inputs can never
+    # collide.
+
+    def __init__(self, key: str = SCRAMBLE_KEY, length: int = CODE_LENGTH):
+        self.domain = 62 ** length
+        bits = (self.domain - 1).bit_length()
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        self.round_keys = [
+            int.from_bytes(hashlib.blake2b(f"{key}:{i}".encode(), digest_size=8).digest(), "big")
+            for i in range(FEISTEL_ROUNDS)
+        ]
+
+    def _round(self, value: int, round_key: int) -> int:
+        # cheap integer mix (splitmix-style), truncated to half the block
+        x = (value ^ round_key) * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF
+        x ^= x >> 29
+        return x & self.mask
+
+    def _permute(self, value: int) -> int:
+        left, right = value >> self.half, value & self.mask
+        for round_key in self.round_keys:
+            left, right = right, left ^ self._round(right, round_key)
+        return (left << self.half) | right
+
+    def __call__(self, value: int) -> int:
+        if not 0 <= value < self.domain:
+            raise ValueError("value out of range")
+        value = self._permute(value)
+        while value >= self.domain:
+            value = self._permute(value)
+        return value
+
+
+class CodeAllocator:
+    # Hands out codes from a block of counter values reserved in the shared
+    # store, so workers never race for the same value and never need to
+    # check-and-retry. Counter values below 62**6 become scrambled
+    # six-character codes; beyond that, plain base62 with more characters.
+
+    def __init__(self, store, block_size: int = BLOCK_SIZE, scramble: bool = True):
+        self.store = store
+        self.block_size = block_size
+        self.scrambler = Scrambler() if scramble else None
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _value(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self.store.reserve_block(self.block_size)
+            value = self._next
+            self._next += 1
+            return value
+
+    def encode(self, value: int) -> str:
+        if self.scrambler is not None and value < self.scrambler.domain:
+            return base62(self.scrambler(value), CODE_LENGTH)
+        return base62(value, CODE_LENGTH)
+
+    def next_code(self) -> str:
+        return self.encode(self._value())
+
+    def next_codes(self, n: int) -> List[str]:
+        return [self.encode(self._value()) for _ in range(n)]
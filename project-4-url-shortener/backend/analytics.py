@@ -0,0 +1,198 @@
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from links import LinkTable
+from store import LinkStore
+
+MERGE_INTERVAL = 5.0
+# referer headers captured between two merges; the oldest are dropped beyond this
+REFERRER_BUFFER = 100_000
+# entries folded between two yields to the event loop
+FOLD_CHUNK = 500
+# resolution -> (bucket width in seconds, number of buckets kept)
+RESOLUTIONS = {
+    "minute": (60, 60),
+    "hour": (3600, 48),
+    "day": (86400, 30),
+}
+# ranking window -> (resolution, buckets summed)
+WINDOWS = {"hour": ("minute", 60), "day": ("hour", 24), "month": ("day", 30)}
+
+
+def first_bucket(resolution: str, now: float, last: int) -> int:
+    width, _ = RESOLUTIONS[resolution]
+    return int(now) // width - last + 1
+
+
+class BatchRows:
+    # What one merge writes: {code: clicks}, (code, resolution, bucket, n)
+    # and (code, host, n) rows
+    __slots__ = ("clicks", "buckets", "referrers")
+
+    def __init__(self):
+        self.clicks: Dict[str, int] = {}
+        self.buckets: List[Tuple[str, str, int, int]] = []
+        self.referrers: List[Tuple[str, str, int]] = []
+
+
+class ClickAnalytics:
+    # The redirect path only bumps a per-worker counter dict and appends the
+    # raw referer header to a bounded buffer. A background task swaps both
+    # out every MERGE_INTERVAL seconds, folds them into bucket and referrer
+    # rows on the event loop (in chunks of FOLD_CHUNK entries, so redirects
+    # still get the loop in between) and adds those rows to the shared
+    # SQLite store in a worker thread. Every uvicorn worker merges its own
+    # shard into the same tables, so the stats read back from the store
+    # cover all workers, up to one MERGE_INTERVAL behind.
+
+    def __init__(self, table: LinkTable, store: LinkStore, interval: float = MERGE_INTERVAL):
+        self.table = table
+        self.store = store
+        self.interval = interval
+        self.pending: Dict[str, int] = {}
+        self.referrers: deque = deque(maxlen=REFERRER_BUFFER)
+        # (window, n) -> (computed at, ranking); the store only changes at merges
+        self._rankings: Dict[Tuple[str, int], Tuple[float, list]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    def record(self, code: str, referer: Optional[bytes] = None):
+        self.pending[code] = self.pending.get(code, 0) + 1
+        if referer:
+            self.referrers.append((code, referer))
+
+    def merge(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        pending, referrers = self._swap()
+        rows = BatchRows()
+        for _ in self._fold(pending, referrers, now, rows):
+            pass
+        self._persist(rows, now)
+        return sum(pending.values())
+
+    def _swap(self):
+        # Must run on the event loop: the redirect path never yields between
+        # reading self.pending and updating it, so swapping here loses nothing.
+        pending, self.pending = self.pending, {}
+        referrers = list(self.referrers)
+        self.referrers.clear()
+        return pending, referrers
+
+    def _fold(self, pending: Dict[str, int], referrers: list, now: float, rows: BatchRows):
+        # Generator: yields after every FOLD_CHUNK entries. Codes the purger
+        # removed in between are skipped, so no rows outlive their link.
+        table = self.table
+        ts = int(now)
+        for i, (code, n) in enumerate(pending.items(), 1):
+            if code in table:
+                rows.clicks[code] = n
+                for resolution, (width, _) in RESOLUTIONS.items():
+                    rows.buckets.append((code, resolution, ts // width, n))
+            if i % FOLD_CHUNK == 0:
+                yield
+        hosts: Dict[bytes, str] = {}
+        counts: Counter = Counter()
+        for i, ((code, referer), n) in enumerate(Counter(referrers).items(), 1):
+            if code in rows.clicks:
+                host = hosts.get(referer)
+                if host is None:
+                    host = hosts[referer] = urlsplit(referer.decode("latin-1")).hostname or "unknown"
+                counts[code, host] += n
+            if i % FOLD_CHUNK == 0:
+                yield
+        rows.referrers = [(code, host, n) for (code, host), n in counts.items()]
+
+    def _persist(self, rows: BatchRows, now: float):
+        # Runs in a worker thread (or inline from merge); only touches the store.
+        # Pruning goes first: if either step fails nothing has been added, so
+        # the whole batch can be retried without counting a click twice.
+        self.store.prune_buckets({
+            resolution: first_bucket(resolution, now, size) for resolution, (_, size) in RESOLUTIONS.items()
+        })
+        if rows.clicks:
+            self.store.add_clicks(rows.clicks, rows.buckets, rows.referrers)
+
+    def _restore(self, pending: Dict[str, int], referrers: list):
+        # Puts a batch that failed to persist back in front of what arrived
+        # since, so the next merge retries it. Codes purged meanwhile are dropped.
+        table = self.table
+        for code, n in pending.items():
+            if code in table:
+                self.pending[code] = self.pending.get(code, 0) + n
+        if referrers:
+            merged = referrers + list(self.referrers)
+            self.referrers.clear()
+            self.referrers.extend(merged)
+
+    def forget(self, code: str):
+        self.pending.pop(code, None)
+
+    # --- Reads: from the store, so they include every worker's merges ---
+    async def clicks(self, code: str) -> int:
+        # this worker's unmerged clicks are added on top; other workers' show
+        # up once they merge
+        pending = self.pending.get(code, 0)
+        return await asyncio.to_thread(self.store.clicks, code) + pending
+
+    async def timeseries(self, code: str, resolution: str, now: Optional[float] = None) -> List[Tuple[int, int]]:
+        # (bucket start epoch, count), oldest first, with empty buckets as 0
+        now = time.time() if now is None else now
+        width, size = RESOLUTIONS[resolution]
+        first = first_bucket(resolution, now, size)
+        counts = await asyncio.to_thread(self.store.click_series, code, resolution, first)
+        return [(b * width, counts.get(b, 0)) for b in range(first, first + size)]
+
+    async def top_referrers(self, code: Optional[str] = None, n: int = 10) -> List[Tuple[str, int]]:
+        if code is None:
+            return await self._cached(("referrers", n), self.store.top_referrers, None, n)
+        return await asyncio.to_thread(self.store.top_referrers, code, n)
+
+    async def top_codes(self, window: str = "day", n: int = 10) -> List[Tuple[str, int]]:
+        resolution, last = WINDOWS[window]
+        first = first_bucket(resolution, time.time(), last)
+        return await self._cached((window, n), self.store.top_codes, resolution, first, n)
+
+    async def _cached(self, key: Tuple[str, int], query: Callable, *args) -> list:
+        # rankings aggregate the whole table, so each worker reuses its last
+        # answer for one merge interval
+        now = time.monotonic()
+        cached = self._rankings.get(key)
+        if cached is None or now - cached[0] >= self.interval:
+            cached = self._rankings[key] = (now, await asyncio.to_thread(query, *args))
+        return cached[1]
+
+    async def _run(self):
+        # stop() sets _stopping instead of cancelling the task, so a merge
+        # that has already swapped its batch out always persists or restores it
+        while True:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            now = time.time()
+            pending, referrers = self._swap()
+            try:
+                rows = BatchRows()
+                for _ in self._fold(pending, referrers, now, rows):
+                    await asyncio.sleep(0)
+                await asyncio.to_thread(self._persist, rows, now)
+            except Exception as exc:
+                print(f"Click merge failed: {exc}")
+                self._restore(pending, referrers)
+
+    def start(self):
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        self.merge()
+
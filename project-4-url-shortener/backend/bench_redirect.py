@@ -0,0 +1,74 @@
+# Redirect throughput at the ASGI boundary (no sockets, one core).
+# Compares the fast path with the same lookup through FastAPI routing;
+# every request carries a Referer header, so click capture is included.
+# Usage: python bench_redirect.py [--links 100000] [--requests 200000]
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+# merged clicks are persisted, so give the run its own throwaway database
+os.environ.setdefault("SHORTENER_DB", os.path.join(tempfile.mkdtemp(prefix="bench-redirect-"), "links.db"))
+
+import main  # noqa: E402
+from analytics import FOLD_CHUNK  # noqa: E402
+
+
+def scope_for(code: str):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": f"/{code}", "raw_path": f"/{code}".encode(),
+        "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"user-agent", b"bench"), (b"accept", b"*/*"),
+                    (b"referer", b"https://news.example.org/item?id=1")],
+        "client": ("127.0.0.1", 50000), "server": ("localhost", 8000),
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def run_app(app, scopes) -> float:
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    started = time.perf_counter()
+    for scope in scopes:
+        await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    assert all(status == 307 for status in statuses), set(statuses)
+    return len(scopes) / elapsed
+
+
+def run(args):
+    main.store.open()
+    rng = random.Random(1)
+    codes = [f"c{i:07d}" for i in range(args.links)]
+    for code in codes:
+        main.links.add(code, f"https://example.com/articles/{code}?ref=short")
+    scopes = [scope_for(rng.choice(codes)) for _ in range(args.requests)]
+
+    fast = asyncio.run(run_app(main.app, scopes))
+    merge_started = time.perf_counter()
+    main.analytics.merge()
+    merge_ms = (time.perf_counter() - merge_started) * 1000
+    routed = asyncio.run(run_app(main.api, scopes[:args.requests // 10]))
+    print(f"links: {args.links}, requests: {args.requests}")
+    print(f"fast path:       {fast:>10,.0f} redirects/s")
+    print(f"FastAPI routing: {routed:>10,.0f} redirects/s")
+    print(f"first merge of {args.requests} hits: {merge_ms:.1f} ms "
+          f"(in the server: chunks of {FOLD_CHUNK} between requests, SQLite write in a thread)")
+    main.store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--links", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=200_000)
+    run(parser.parse_args())
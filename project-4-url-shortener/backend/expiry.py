@@ -0,0 +1,100 @@
+import asyncio
+import heapq
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from analytics import ClickAnalytics
+from links import LinkTable
+from store import LinkStore
+
+PURGE_INTERVAL = 1.0
+PURGE_BATCH = 1000
+
+
+class ExpiryIndex:
+    # Min-heap of (expires_at, code). Entries are never removed from the
+    # middle: when one is popped, it is only acted on if the code still
+    # exists with that same expiry.
+
+    def __init__(self):
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, expires_at: int, code: str):
+        heapq.heappush(self._heap, (expires_at, code))
+
+    def extend(self, entries: Iterable[Tuple[int, str]]):
+        self._heap.extend(entries)
+        heapq.heapify(self._heap)
+
+    def next_expiry(self) -> Optional[int]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_expired(self, now: float, limit: int) -> List[Tuple[int, str]]:
+        heap = self._heap
+        expired = []
+        while heap and heap[0][0] <= now and len(expired) < limit:
+            expired.append(heapq.heappop(heap))
+        return expired
+
+
+class ExpiryPurger:
+    # Removes expired links a batch at a time: from the in-memory table and
+    # analytics on the event loop, then from the store in a worker thread.
+    # A full batch is followed straight away by the next one, so a backlog
+    # drains quickly without blocking the loop for long.
+
+    def __init__(self, table: LinkTable, index: ExpiryIndex, store: LinkStore,
+                 analytics: ClickAnalytics, interval: float = PURGE_INTERVAL,
+                 batch: int = PURGE_BATCH):
+        self.table = table
+        self.index = index
+        self.store = store
+        self.analytics = analytics
+        self.interval = interval
+        self.batch = batch
+        self.purged = 0
+        # removed from memory but not yet from the store; retried every tick
+        self._unsaved: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def purge_batch(self, now: float) -> Tuple[int, List[str]]:
+        # Returns (entries popped, codes removed)
+        entries = self.index.pop_expired(now, self.batch)
+        table = self.table
+        removed = []
+        for expires_at, code in entries:
+            row = table.row(code)
+            if row is not None and table.expires[row] == expires_at:
+                table.remove(code)
+                self.analytics.forget(code)
+                removed.append(code)
+        self.purged += len(removed)
+        return len(entries), removed
+
+    async def _run(self):
+        while True:
+            popped = 0
+            try:
+                popped, removed = self.purge_batch(time.time())
+                self._unsaved.extend(removed)
+                if self._unsaved:
+                    await asyncio.to_thread(self.store.delete, self._unsaved)
+                    self._unsaved = []
+            except Exception as exc:
+                # the codes stay in _unsaved; wait a full interval before retrying
+                print(f"Expiry purge failed: {exc}")
+                popped = 0
+            await asyncio.sleep(0 if popped == self.batch else self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,44 @@
+import time
+
+from analytics import ClickAnalytics
+from links import LinkTable
+
+REDIRECT_STATUS = 307
+
+
+class RedirectFastPath:
+    # ASGI app placed in front of the API. GET /{code} for a live link is
+    # answered straight from the LinkTable, without FastAPI routing,
+    # middleware or response objects. Everything else, including unknown
+    # and expired codes, is passed to the wrapped app, which produces the
+    # usual error responses. A hit costs one dict increment and, when a
+    # Referer header is present, one deque append; aggregation happens in
+    # ClickAnalytics.merge off the request path.
+
+    def __init__(self, app, table: LinkTable, analytics: ClickAnalytics):
+        self.app = app
+        self.table = table
+        self.analytics = analytics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            path = scope["path"]
+            if path.find("/", 1) == -1 and len(path) > 1:
+                code = path[1:]
+                location = self.table.resolve(code, time.time())
+                if location is not None:
+                    analytics = self.analytics
+                    pending = analytics.pending
+                    pending[code] = pending.get(code, 0) + 1
+                    for name, value in scope["headers"]:
+                        if name == b"referer":
+                            analytics.referrers.append((code, value))
+                            break
+                    await send({
+                        "type": "http.response.start",
+                        "status": REDIRECT_STATUS,
+                        "headers": [(b"location", location), (b"content-length", b"0")],
+                    })
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+        await self.app(scope, receive, send)
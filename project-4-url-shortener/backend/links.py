@@ -0,0 +1,101 @@
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+# Links live for 7 days after creation
+LINK_TTL = 7 * 24 * 3600
+# same escaping as starlette's RedirectResponse, so both paths send identical Location headers
+LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+
+class LinkTable:
+    # Column-oriented table of links: a dict maps each code to a row number
+    # and every field lives in its own list or typed array. Timestamps are
+    # integer epoch seconds and the Location header value is encoded once
+    # when the link is added, so a redirect is one dict lookup and one
+    # compare. Click counts live in the store (see analytics.ClickAnalytics).
+    # A second dict indexes long URLs (most recent code wins) for dedupe.
+    __slots__ = ("_rows", "_by_url", "codes", "urls", "locations", "created", "expires", "_free")
+
+    def __init__(self):
+        self._rows: Dict[str, int] = {}
+        self._by_url: Dict[str, str] = {}
+        self.codes: List[Optional[str]] = []
+        self.urls: List[Optional[str]] = []
+        self.locations: List[Optional[bytes]] = []
+        self.created = array("q")
+        self.expires = array("q")
+        self._free: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._rows
+
+    def add(self, code: str, long_url: str, created_at: Optional[int] = None,
+            ttl: int = LINK_TTL) -> int:
+        if created_at is None:
+            created_at = int(time.time())
+        location = quote(long_url, safe=LOCATION_SAFE).encode()
+        row = self._rows.get(code)
+        if row is not None:
+            self._unindex_url(code, row)
+        elif self._free:
+            row = self._free.pop()
+        if row is None:
+            row = len(self.codes)
+            self.codes.append(code)
+            self.urls.append(long_url)
+            self.locations.append(location)
+            self.created.append(created_at)
+            self.expires.append(created_at + ttl)
+        else:
+            self.codes[row] = code
+            self.urls[row] = long_url
+            self.locations[row] = location
+            self.created[row] = created_at
+            self.expires[row] = created_at + ttl
+        self._rows[code] = row
+        self._by_url[long_url] = code
+        return row
+
+    def _unindex_url(self, code: str, row: int):
+        url = self.urls[row]
+        if self._by_url.get(url) == code:
+            del self._by_url[url]
+
+    def load(self, rows: Iterable[Tuple[str, str, int, int, int]]) -> int:
+        # Bulk insert at startup; rows are (code, long_url, created_at, expires_at, clicks)
+        count = 0
+        for code, long_url, created_at, expires_at, _ in rows:
+            self.add(code, long_url, created_at, expires_at - created_at)
+            count += 1
+        return count
+
+    def remove(self, code: str) -> bool:
+        row = self._rows.pop(code, None)
+        if row is None:
+            return False
+        self._unindex_url(code, row)
+        self.codes[row] = self.urls[row] = self.locations[row] = None
+        self._free.append(row)
+        return True
+
+    def row(self, code: str) -> Optional[int]:
+        return self._rows.get(code)
+
+    def find_url(self, long_url: str, now: float) -> Optional[str]:
+        # Code of a live link to exactly this URL, if any
+        code = self._by_url.get(long_url)
+        if code is None or self.expires[self._rows[code]] <= now:
+            return None
+        return code
+
+    def resolve(self, code: str, now: float) -> Optional[bytes]:
+        # Location of a live link; None if missing or expired
+        row = self._rows.get(code)
+        if row is None or self.expires[row] <= now:
+            return None
+        return self.locations[row]
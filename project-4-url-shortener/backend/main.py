@@ -1,16 +1,69 @@
-import secrets
-from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import RedirectResponse
+import asyncio
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from pydantic import BaseModel, Field, HttpUrl
+from typing import List, Optional
 
-app = FastAPI()
+from allocator import CodeAllocator
+from analytics import ClickAnalytics
+from expiry import ExpiryIndex, ExpiryPurger
+from fastpath import RedirectFastPath
+from links import LINK_TTL, LinkTable
+from store import DB_PATH, LinkRow, LinkStore, export_ndjson, parse_ndjson
+
+# --- Сақтау ---
+# SQLite (WAL) — тұрақты көшірме; редирект әрқашан жадтағы кестеден оқылады
+store = LinkStore(DB_PATH)
+# code -> жол нөмірі; url, created/expires (epoch секунд) бағандарда
+links = LinkTable()
+# Басулар алдымен воркердің жеке санауышына түседі, фонда SQLite-тағы ортақ минут/сағат/күн
+# бакеттеріне қосылады; статистика сол жерден оқылады, сондықтан барлық воркерді қамтиды
+analytics = ClickAnalytics(links, store)
+# Мерзімі өткен кодтар min-heap бойынша фонда бөліктеп өшіріледі
+expiry = ExpiryIndex()
+purger = ExpiryPurger(links, expiry, store, analytics)
+# Кодтар ортақ санауыштан воркерге бөлінген блоктардан base62 түрінде алынады
+allocator = CodeAllocator(store)
+MAX_BULK_URLS = 10_000
+LOOP_CHUNK = 1000
+
+
+def load_links() -> int:
+    now = int(time.time())
+    store.delete_expired(now)
+    entries = []
+    count = 0
+    for rows in store.iter_rows(now):
+        count += links.load(rows)
+        entries.extend((expires_at, code) for code, _, _, expires_at, _ in rows)
+    expiry.extend(entries)
+    return count
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    store.open()
+    started = time.perf_counter()
+    count = load_links()
+    print(f"Loaded {count} links in {time.perf_counter() - started:.2f}s")
+    analytics.start()
+    purger.start()
+    yield
+    await purger.stop()
+    await analytics.stop()
+    store.close()
+
+
+api = FastAPI(lifespan=lifespan)
 
 # --- CORS рұқсаттары ---
 origins = ["http://localhost:3000"]
-app.add_middleware(
+api.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
@@ -18,35 +71,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Жадта сақталатын "база" ---
-# {short_code: {long_url, clicks, created_at}}
-url_db = {}
+# Бұл атаулар API беттерімен қақтығысады, сондықтан қысқа код бола алмайды
+RESERVED_CODES = {"api", "docs", "redoc", "openapi.json"}
+
+
+def usable_code(code: str) -> bool:
+    # Бос, қызметтік немесе "/" бар код ешқашан қайта бағыттауға жетпейді
+    return bool(code) and code not in RESERVED_CODES and "/" not in code
+
+
+async def find_link(code: str) -> Optional[int]:
+    # Кесте әр воркерде іске қосылғанда бір рет толтырылады, сондықтан басқа
+    # воркер жасаған немесе импорттаған код мұнда болмауы мүмкін: табылмаса
+    # базадан іздеп, тірі болса кестеге қосамыз
+    row = links.row(code)
+    if row is not None:
+        return row
+    found = await asyncio.to_thread(store.get, code)
+    if found is None or found[3] <= time.time():
+        return None
+    if code not in links:
+        links.load([found])
+        expiry.push(found[3], code)
+    return links.row(code)
+
+
+def utc_datetime(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+def time_series(points):
+    return [{"time": utc_datetime(ts), "clicks": n} for ts, n in points]
+
+
+def ranking(items, key: str):
+    return [{key: name, "clicks": n} for name, n in items]
+
 
 # --- Pydantic модельдері ---
 class URLCreate(BaseModel):
     long_url: HttpUrl
     custom_code: Optional[str] = None
 
+
+class BulkURLCreate(BaseModel):
+    urls: List[HttpUrl] = Field(..., min_length=1, max_length=MAX_BULK_URLS)
+
+
+# Кодтарды есептеу мен блок резервтеу (SQLite-қа жазу) thread-те жүреді;
+# custom код бұрын алып қойғандары event loop-та тасталады
+async def new_codes(n: int) -> List[str]:
+    codes = []
+    while len(codes) < n:
+        fresh = await asyncio.to_thread(allocator.next_codes, n - len(codes))
+        codes.extend(code for code in fresh if code not in links)
+    return codes
+
+
+# links пен expiry тек event loop-та өзгереді (purger де сонда жұмыс істейді),
+# сондықтан жасау handler-лері async; SQLite-қа жазу ғана thread-те.
+# Үлкен пакет кестеге LOOP_CHUNK-тан бөліктеп қосылады, арасында
+# қайта бағыттаулар event loop-ты ала алады
+async def create_links(long_urls: List[str]) -> List[str]:
+    # Барлығы бір транзакциямен сақталады; басқа воркер custom код ретінде
+    # алып қойған кодтар жаңасымен ауыстырылып, қайта жазылады
+    created_at = int(time.time())
+    expires_at = created_at + LINK_TTL
+    codes: List[Optional[str]] = [None] * len(long_urls)
+    todo = list(range(len(long_urls)))
+    while todo:
+        batch = dict(zip(await new_codes(len(todo)), todo))
+        inserted = await asyncio.to_thread(
+            store.insert_new,
+            [(code, long_urls[i], created_at, expires_at, 0) for code, i in batch.items()],
+        )
+        for n, (code, *_) in enumerate(inserted, 1):
+            i = batch.pop(code)
+            codes[i] = code
+            links.add(code, long_urls[i], created_at)
+            expiry.push(expires_at, code)
+            if n % LOOP_CHUNK == 0:
+                await asyncio.sleep(0)
+        todo = list(batch.values())
+    return codes
+
 # --- Қысқа сілтеме жасау ---
-@app.post("/api/shorten")
-def create_short_url(url_data: URLCreate, request: Request):
+@api.post("/api/shorten")
+async def create_short_url(url_data: URLCreate, request: Request):
     long_url = str(url_data.long_url)
     custom_code = url_data.custom_code
 
     if custom_code:
-        if custom_code in url_db:
+        if custom_code in links or not usable_code(custom_code):
             raise HTTPException(status_code=400, detail="Бұл қысқа код қолданылып қойған")
         short_code = custom_code
+        created_at = int(time.time())
+        try:
+            # Басқа воркер дәл осы кодты алып үлгерсе, PRIMARY KEY қатесі шығады
+            await asyncio.to_thread(store.insert, (short_code, long_url, created_at, created_at + LINK_TTL, 0))
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=400, detail="Бұл қысқа код қолданылып қойған")
+        links.add(short_code, long_url, created_at)
+        expiry.push(created_at + LINK_TTL, short_code)
     else:
-        short_code = secrets.token_urlsafe(4)
-        while short_code in url_db:
-            short_code = secrets.token_urlsafe(4)
-
-    url_db[short_code] = {
-        "long_url": long_url,
-        "clicks": 0,
-        "created_at": datetime.utcnow()
-    }
+        short_code = (await create_links([long_url]))[0]
 
     short_url = f"{request.base_url}{short_code}"
     return {
@@ -54,28 +182,101 @@ def create_short_url(url_data: URLCreate, request: Request):
         "clicks": 0
     }
 
+# --- Көп сілтемені бір сұраныспен қысқарту ---
+# Бірдей ұзын URL-дер (сұраныс ішінде де, бұрыннан бар тірі сілтемелермен де) бір кодты алады
+@api.post("/api/shorten/bulk")
+async def create_short_urls_bulk(data: BulkURLCreate, request: Request):
+    now = time.time()
+    long_urls = [str(url) for url in data.urls]
+    codes = {}
+    fresh = []
+    for url in long_urls:
+        if url not in codes:
+            codes[url] = links.find_url(url, now)
+            if codes[url] is None:
+                fresh.append(url)
+    codes.update(zip(fresh, await create_links(fresh)))
+
+    base_url = str(request.base_url)
+    return {
+        "created": len(fresh),
+        "results": [{"long_url": url, "short_url": f"{base_url}{codes[url]}"} for url in long_urls],
+    }
+
 # --- Қайта бағыттау ---
-@app.get("/{short_code}")
-def redirect_to_long_url(short_code: str):
-    entry = url_db.get(short_code)
-    if not entry:
+# Тірі сілтемелерге RedirectFastPath жауап береді; бұл маршрутқа тек
+# кестеде жоқ немесе мерзімі өткен кодтар жетеді
+@api.get("/{short_code}")
+async def redirect_to_long_url(short_code: str, request: Request):
+    row = await find_link(short_code)
+    if row is None:
         raise HTTPException(status_code=404, detail="Мұндай қысқа сілтеме табылмады")
 
     # Мерзімі өтіп кеткенін тексеру (7 күн)
-    if datetime.utcnow() - entry["created_at"] > timedelta(days=7):
+    if links.expires[row] <= time.time():
         raise HTTPException(status_code=404, detail="Сілтеменің мерзімі өтіп кеткен")
 
     # Click санау
-    entry["clicks"] += 1
-    return RedirectResponse(url=entry["long_url"])
+    analytics.record(short_code, request.headers.get("referer", "").encode("latin-1"))
+    return RedirectResponse(url=links.urls[row])
 
 # --- Тексеру үшін ---
-@app.get("/api/stats/{short_code}")
-def get_stats(short_code: str):
-    entry = url_db.get(short_code)
-    if not entry:
+# /api/stats/{code}?resolution=minute|hour|day — уақыт қатары және негізгі referrer-лер
+# Сандар ортақ SQLite-тан оқылады, басқа воркерлердің басулары бір біріктіру аралығынан кейін көрінеді
+@api.get("/api/stats/{short_code}")
+async def get_stats(short_code: str, resolution: str = Query("hour", pattern="^(minute|hour|day)$")):
+    row = await find_link(short_code)
+    if row is None:
         raise HTTPException(status_code=404, detail="Сілтеме табылмады")
     return {
-        "clicks": entry["clicks"],
-        "created_at": entry["created_at"]
+        "clicks": await analytics.clicks(short_code),
+        "created_at": utc_datetime(links.created[row]),
+        "resolution": resolution,
+        "series": time_series(await analytics.timeseries(short_code, resolution)),
+        "top_referrers": ranking(await analytics.top_referrers(short_code), "referrer"),
     }
+
+
+# --- Жалпы рейтинг: ең көп басылған кодтар және referrer-лер ---
+@api.get("/api/stats")
+async def get_rankings(window: str = Query("day", pattern="^(hour|day|month)$"),
+                 limit: int = Query(10, ge=1, le=100)):
+    return {
+        "window": window,
+        "top_codes": ranking(await analytics.top_codes(window, limit), "code"),
+        "top_referrers": ranking(await analytics.top_referrers(None, limit), "referrer"),
+    }
+
+
+# --- Импорт / экспорт (NDJSON) ---
+@api.get("/api/links/export")
+def export_links():
+    return StreamingResponse(export_ndjson(store, int(time.time())), media_type="application/x-ndjson")
+
+
+def read_import(body: bytes) -> List[LinkRow]:
+    # Талдау мен сүзу thread-те жүреді: үлкен импорт event loop-ты ұстамайды
+    rows = parse_ndjson(body.decode("utf-8").splitlines(), LINK_TTL)
+    now = time.time()
+    return [row for row in rows if usable_code(row[0]) and row[3] > now]
+
+
+@api.post("/api/links/import")
+async def import_links(request: Request):
+    body = await request.body()
+    try:
+        rows = await asyncio.to_thread(read_import, body)
+    except ValueError as exc:  # UnicodeDecodeError да осында түседі
+        raise HTTPException(status_code=400, detail=str(exc))
+    # Бар кодтар қайта жазылмайды; кестеге тек базаға шынымен қосылғандары түседі,
+    # LOOP_CHUNK-тан бөліктеп, арасында қайта бағыттауларға жол беріп
+    inserted = await asyncio.to_thread(store.insert_new, rows)
+    for start in range(0, len(inserted), LOOP_CHUNK):
+        links.load(inserted[start:start + LOOP_CHUNK])
+        await asyncio.sleep(0)
+    expiry.extend((row[3], row[0]) for row in inserted)
+    return {"received": len(rows), "imported": len(inserted)}
+
+
+# uvicorn main:app — қайта бағыттаулар FastAPI-ге жетпей-ақ өңделеді
+app = RedirectFastPath(api, links, analytics)
@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DB_PATH = os.getenv("SHORTENER_DB", "shortener.db")
+LOAD_BATCH = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    code TEXT PRIMARY KEY,
+    long_url TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL,
+    clicks INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_links_expires_at ON links (expires_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    next INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS click_buckets (
+    code TEXT NOT NULL,
+    resolution TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    clicks INTEGER NOT NULL,
+    PRIMARY KEY (code, resolution, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_click_buckets_window ON click_buckets (resolution, bucket);
+CREATE TABLE IF NOT EXISTS click_referrers (
+    code TEXT NOT NULL,
+    host TEXT NOT NULL,
+    clicks INTEGER NOT NULL,
+    PRIMARY KEY (code, host)
+) WITHOUT ROWID;
+"""
+
+# (code, long_url, created_at, expires_at, clicks)
+LinkRow = Tuple[str, str, int, int, int]
+FIELDS = ("code", "long_url", "created_at", "expires_at", "clicks")
+
+
+class LinkStore:
+    # SQLite in WAL mode is the durable copy; the in-memory LinkTable stays
+    # the read path. One connection shared behind a lock: writes are short
+    # and come from the API threadpool, the click merger and the purger.
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(SCHEMA)
+                self._conn = conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    def get(self, code: str) -> Optional[LinkRow]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT code, long_url, created_at, expires_at, clicks FROM links WHERE code = ?", (code,)
+            ).fetchone()
+
+    def reserve_block(self, size: int, name: str = "links") -> Tuple[int, int]:
+        # Atomically claims [start, start + size) of a named counter; the
+        # write lock SQLite takes for UPDATE keeps workers from overlapping
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO counters VALUES (?, 0)", (name,))
+            end = conn.execute(
+                "UPDATE counters SET next = next + ? WHERE name = ? RETURNING next", (size, name)
+            ).fetchone()[0]
+        return end - size, end
+
+    def insert(self, row: LinkRow):
+        with self._lock:
+            self._conn.execute("INSERT INTO links VALUES (?, ?, ?, ?, ?)", row)
+
+    def insert_many(self, rows: Iterable[LinkRow], replace: bool = False) -> int:
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(f"{verb} INTO links VALUES (?, ?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def insert_new(self, rows: Iterable[LinkRow]) -> List[LinkRow]:
+        # Like insert_many without replace, but returns the rows actually inserted
+        inserted = []
+        with self._transaction() as conn:
+            for row in rows:
+                if conn.execute("INSERT OR IGNORE INTO links VALUES (?, ?, ?, ?, ?)", row).rowcount:
+                    inserted.append(row)
+        return inserted
+
+    def add_clicks(self, deltas: Dict[str, int], buckets: Iterable[Tuple[str, str, int, int]] = (),
+                   referrers: Iterable[Tuple[str, str, int]] = ()):
+        # One worker's merge: link totals plus (code, resolution, bucket, n)
+        # and (code, host, n) rows, added to what other workers wrote
+        if not deltas:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE links SET clicks = clicks + ? WHERE code = ?",
+                ((n, code) for code, n in deltas.items()),
+            )
+            conn.executemany(
+                "INSERT INTO click_buckets VALUES (?, ?, ?, ?) ON CONFLICT (code, resolution, bucket) "
+                "DO UPDATE SET clicks = clicks + excluded.clicks",
+                buckets,
+            )
+            conn.executemany(
+                "INSERT INTO click_referrers VALUES (?, ?, ?) ON CONFLICT (code, host) "
+                "DO UPDATE SET clicks = clicks + excluded.clicks",
+                referrers,
+            )
+
+    def prune_buckets(self, first: Dict[str, int]):
+        # first: resolution -> oldest bucket still kept
+        with self._transaction() as conn:
+            conn.executemany(
+                "DELETE FROM click_buckets WHERE resolution = ? AND bucket < ?", first.items()
+            )
+
+    def clicks(self, code: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT clicks FROM links WHERE code = ?", (code,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def click_series(self, code: str, resolution: str, first: int) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT bucket, clicks FROM click_buckets WHERE code = ? AND resolution = ? AND bucket >= ?",
+                (code, resolution, first),
+            ))
+
+    def top_codes(self, resolution: str, first: int, n: int) -> List[Tuple[str, int]]:
+        # joined with links so codes deleted by another worker drop out
+        with self._lock:
+            return self._conn.execute(
+                "SELECT b.code, SUM(b.clicks) AS total FROM click_buckets b JOIN links l ON l.code = b.code "
+                "WHERE b.resolution = ? AND b.bucket >= ? GROUP BY b.code ORDER BY total DESC LIMIT ?",
+                (resolution, first, n),
+            ).fetchall()
+
+    def top_referrers(self, code: Optional[str], n: int) -> List[Tuple[str, int]]:
+        with self._lock:
+            if code is not None:
+                return self._conn.execute(
+                    "SELECT host, clicks FROM click_referrers WHERE code = ? ORDER BY clicks DESC LIMIT ?",
+                    (code, n),
+                ).fetchall()
+            return self._conn.execute(
+                "SELECT host, SUM(clicks) AS total FROM click_referrers GROUP BY host ORDER BY total DESC LIMIT ?",
+                (n,),
+            ).fetchall()
+
+    def delete(self, codes: List[str]):
+        if not codes:
+            return
+        with self._transaction() as conn:
+            for table in ("links", "click_buckets", "click_referrers"):
+                conn.executemany(f"DELETE FROM {table} WHERE code = ?", ((code,) for code in codes))
+
+    def delete_expired(self, now: int) -> int:
+        with self._transaction() as conn:
+            for table in ("click_buckets", "click_referrers"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE code IN (SELECT code FROM links WHERE expires_at <= ?)", (now,)
+                )
+            return conn.execute("DELETE FROM links WHERE expires_at <= ?", (now,)).rowcount
+
+    def iter_rows(self, live_after: int = 0, batch: int = LOAD_BATCH) -> Iterator[List[LinkRow]]:
+        # Batches of rows that expire after live_after, in primary key order.
+        # Keyset pagination, so the lock is only held for one batch at a time.
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT code, long_url, created_at, expires_at, clicks FROM links "
+                    "WHERE code > ? AND expires_at > ? ORDER BY code LIMIT ?",
+                    (last, live_after, batch),
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last = rows[-1][0]
+
+
+# --- NDJSON import/export ---
+def export_ndjson(store: LinkStore, live_after: int = 0) -> Iterator[str]:
+    for rows in store.iter_rows(live_after):
+        for row in rows:
+            yield json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n"
+
+
+def parse_ndjson(lines: Iterable[str], default_ttl: int) -> Iterator[LinkRow]:
+    # Missing created_at means now, missing expires_at means created_at + default_ttl
+    now = int(time.time())
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("expected a JSON object")
+            created = int(item.get("created_at", now))
+            yield (
+                str(item["code"]),
+                str(item["long_url"]),
+                created,
+                int(item.get("expires_at", created + default_ttl)),
+                int(item.get("clicks", 0)),
+            )
+        except (ValueError, KeyError, TypeError) as exc:
+            raise ValueError(f"line {number}: {exc}") from exc
+
+
+# --- CLI: python store.py export > links.ndjson | import links.ndjson | purge | count ---
+if __name__ == "__main__":
+    from links import LINK_TTL
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "count"
+    store = LinkStore()
+    store.open()
+    if command == "export":
+        sys.stdout.writelines(export_ndjson(store, int(time.time())))
+    elif command == "import":
+        with open(sys.argv[2], encoding="utf-8") as f:
+            print(f"imported {store.insert_many(parse_ndjson(f, LINK_TTL))} links")
+    elif command == "purge":
+        print(f"deleted {store.delete_expired(int(time.time()))} expired links")
+    elif command == "count":
+        print(store.count())
+    else:
+        sys.exit(f"unknown command: {command}")
+    store.close()
@@ -0,0 +1,99 @@
+# Sustained vote ingestion at the ASGI boundary (no sockets, one core).
+# --clients concurrent voters each send votes back to back for --seconds;
+# latency is measured from request start to the acknowledged (durable)
+# response. With --batch N each request carries N votes through
+# /api/poll/vote/batch. The journal writes to a temp dir with real fsyncs.
+# Usage: python bench_votes.py [--clients 200] [--seconds 5] [--polls 10] [--batch 0]
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("POLL_DATA_DIR", tempfile.mkdtemp(prefix="bench-votes-"))
+
+import main  # noqa: E402
+
+
+def scope_for(path: str, body: bytes):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("localhost", 8000),
+    }
+
+
+async def call(path: str, body: bytes) -> int:
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await main.app(scope_for(path, body), receive, send)
+    return status
+
+
+async def voter(polls, args, deadline, latencies, rng):
+    sent = 0
+    while time.perf_counter() < deadline:
+        if args.batch:
+            items = []
+            for _ in range(args.batch):
+                poll = rng.choice(polls)
+                items.append({"poll_id": poll.id, "option": rng.choice(list(poll.options))})
+            path, body, n = "/api/poll/vote/batch", json.dumps({"votes": items}).encode(), args.batch
+        else:
+            poll = rng.choice(polls)
+            payload = {"poll_id": poll.id, "option": rng.choice(list(poll.options))}
+            path, body, n = "/api/poll/vote", json.dumps(payload).encode(), 1
+        started = time.perf_counter()
+        status = await call(path, body)
+        latencies.append(time.perf_counter() - started)
+        assert status == 200, status
+        sent += n
+    return sent
+
+
+async def run(args):
+    await main.journal.open(main.store)
+    polls = [main.store.create(f"Question {i}?", ["a", "b", "c", "d"]) for i in range(args.polls)]
+    latencies = []
+    deadline = time.perf_counter() + args.seconds
+    started = time.perf_counter()
+    sent = await asyncio.gather(*(
+        voter(polls, args, deadline, latencies, random.Random(i)) for i in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - started
+    await main.votes.close()
+    await main.journal.close()
+
+    total = sum(sent)
+    counted = sum(poll.total_votes for poll in polls)
+    assert counted == total, (counted, total)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    mode = f"batch of {args.batch}" if args.batch else "single votes"
+    print(f"clients: {args.clients}, polls: {args.polls}, {mode}, flush every {main.votes.interval * 1000:g} ms")
+    print(f"sustained: {total / elapsed:>10,.0f} votes/s ({total} votes in {elapsed:.1f} s)")
+    print(f"latency:   p50 {p50:.1f} ms, p99 {p99:.1f} ms per request")
+    print(f"flushes:   {main.votes.flushes} ({total / max(1, main.votes.flushes):.0f} votes per journal op)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--polls", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
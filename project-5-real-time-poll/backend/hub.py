@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional, Set
+
+from store import PollStore
+
+PUSH_RATE = float(os.getenv("POLL_PUSH_RATE", "4"))  # max pushes per second per poll
+SUBSCRIBER_BUFFER = 1
+
+
+class Update:
+    # One tick's payload, serialized once and shared by every subscriber
+    __slots__ = ("version", "text", "_sse")
+
+    def __init__(self, version: int, text: str):
+        self.version = version
+        self.text = text
+        self._sse = None
+
+    @property
+    def sse(self) -> bytes:
+        if self._sse is None:
+            self._sse = f"id: {self.version}\nevent: results\ndata: {self.text}\n\n".encode()
+        return self._sse
+
+
+class Subscription:
+    # Holds only the newest update: a viewer that falls behind skips
+    # intermediate ticks instead of queueing them, and the counts it finally
+    # gets are still complete
+
+    def __init__(self, hub: "BroadcastHub", poll_id: str):
+        self.hub = hub
+        self.poll_id = poll_id
+        self._latest: Optional[Update] = None
+        self._ready = asyncio.Event()
+
+    def offer(self, update: Update):
+        self._latest = update
+        self._ready.set()
+
+    async def get(self) -> Update:
+        await self._ready.wait()
+        self._ready.clear()
+        update, self._latest = self._latest, None
+        return update
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class Channel:
+    __slots__ = ("subscribers", "sent_at", "sent_counts", "timer", "last")
+
+    def __init__(self):
+        self.subscribers: Set[Subscription] = set()
+        self.sent_at = 0.0
+        self.sent_counts: Dict[str, int] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.last: Optional[Update] = None
+
+
+class BroadcastHub:
+    # Per-poll fan-out. Votes only mark a poll dirty; at most `rate` times a
+    # second the poll is serialized once and the same payload is handed to
+    # every subscriber, so the cost of a vote does not grow with the number
+    # of viewers. Polls nobody watches are skipped entirely.
+
+    def __init__(self, store: PollStore, rate: float = PUSH_RATE):
+        self.store = store
+        self.interval = 1.0 / rate
+        self._channels: Dict[str, Channel] = {}
+        self.pushes = 0
+
+    def subscribe(self, poll_id: str) -> Subscription:
+        channel = self._channels.get(poll_id)
+        if channel is None:
+            channel = self._channels[poll_id] = Channel()
+        subscription = Subscription(self, poll_id)
+        channel.subscribers.add(subscription)
+        # new viewers start from the last push without waiting for a vote; if
+        # votes arrived since, a tick is already scheduled and brings them up
+        update = channel.last if channel.last is not None else self._serialize(channel, poll_id)
+        if update is not None:
+            subscription.offer(update)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        channel = self._channels.get(subscription.poll_id)
+        if channel is None:
+            return
+        channel.subscribers.discard(subscription)
+        if not channel.subscribers:
+            if channel.timer is not None:
+                channel.timer.cancel()
+            del self._channels[subscription.poll_id]
+
+    def notify(self, poll_id: str):
+        channel = self._channels.get(poll_id)
+        if channel is None or channel.timer is not None:
+            return
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, channel.sent_at + self.interval - time.monotonic())
+        channel.timer = loop.call_later(delay, self._tick, poll_id)
+
+    def _tick(self, poll_id: str):
+        channel = self._channels.get(poll_id)
+        if channel is None:
+            return
+        channel.timer = None
+        channel.sent_at = time.monotonic()
+        update = self._serialize(channel, poll_id)
+        if update is None:
+            return
+        for subscription in channel.subscribers:
+            subscription.offer(update)
+        self.pushes += 1
+
+    def _serialize(self, channel: Channel, poll_id: str) -> Optional[Update]:
+        poll = self.store.get(poll_id)
+        if poll is None:
+            return None
+        # delta: votes per option since the previous push, for clients that
+        # animate changes; the full counts are always included
+        delta = {
+            option: votes - channel.sent_counts.get(option, 0)
+            for option, votes in poll.options.items()
+            if votes != channel.sent_counts.get(option, 0)
+        }
+        channel.sent_counts = dict(poll.options)
+        text = json.dumps({
+            "poll_id": poll.id,
+            "version": poll.version,
+            "question": poll.question,
+            "options": [{"option": k, "votes": v} for k, v in poll.options.items()],
+            "delta": delta,
+        }, ensure_ascii=False, separators=(",", ":"))
+        channel.last = Update(poll.version, text)
+        return channel.last
+
+    def close(self):
+        for channel in self._channels.values():
+            if channel.timer is not None:
+                channel.timer.cancel()
+        self._channels.clear()
+
+    def stats(self) -> dict:
+        return {
+            "polls": len(self._channels),
+            "subscribers": sum(len(c.subscribers) for c in self._channels.values()),
+            "pushes": self.pushes,
+        }
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import math
+import os
+from typing import Callable, Dict, List, Optional, Set
+
+from store import PollStore
+
+FLUSH_INTERVAL = float(os.getenv("POLL_FLUSH_INTERVAL", "0.01"))
+# Dedupe is in memory: the filter starts empty on every restart, so it only
+# stops repeats since the server started. Durable one-vote-per-client needs the ids in the journal.
+DEDUPE = os.getenv("POLL_DEDUPE", "0") == "1"
+DEDUPE_CAPACITY = int(os.getenv("POLL_DEDUPE_CAPACITY", "1000000"))
+DEDUPE_ERROR_RATE = float(os.getenv("POLL_DEDUPE_ERROR_RATE", "0.001"))
+
+
+class VoteRejected(Exception):
+    # reason is one of "poll", "option", "duplicate"; main.py owns the messages
+    def __init__(self, status: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+class BloomFilter:
+    # Bit array sized for `capacity` keys at `error_rate` false positives
+    # (1M keys at 0.1% is about 1.8 MB). Probes come from one blake2b digest
+    # by double hashing. No false negatives: a key that was added is always
+    # reported as seen. Past capacity the false positive rate climbs.
+
+    def __init__(self, capacity: int = DEDUPE_CAPACITY, error_rate: float = DEDUPE_ERROR_RATE):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _probes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._probes(key))
+
+    def add(self, key: str) -> bool:
+        # True if the key is new, False if it was (probably) added before
+        probes = self._probes(key)
+        bits = self.bits
+        if all(bits[p >> 3] & (1 << (p & 7)) for p in probes):
+            return False
+        for p in probes:
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+        return True
+
+
+class VoteIngestor:
+    # Votes are validated on arrival and added to the pending counters
+    # (poll -> option -> n). Nothing else happens per vote: every `interval`
+    # the counters are swapped out, applied to the store with one version
+    # bump per poll and written as a single "votes" journal op. The server
+    # runs as a single process (the journal refuses to share its data dir)
+    # and everything runs on its event loop, so no locks are needed. Callers
+    # await commit() to be answered once their batch is durable. If the
+    # journal write fails, the journal has already cut the op back out of
+    # the log, so the batch's counts are taken back out of the store and its
+    # clients are not remembered; a retry is then counted exactly once, in
+    # memory and after a restart.
+
+    def __init__(self, store: PollStore, journal, on_flush: Optional[Callable[[str], None]] = None,
+                 interval: float = FLUSH_INTERVAL, dedupe: bool = DEDUPE):
+        self.store = store
+        self.journal = journal
+        self.on_flush = on_flush
+        self.interval = interval
+        self.seen = BloomFilter() if dedupe else None
+        self.pending: Dict[str, Dict[str, int]] = {}
+        # dedupe keys of the pending batch, and of every batch not yet durable;
+        # they only enter the bloom filter once their batch is in the journal
+        self._clients: List[str] = []
+        self._unsaved: Set[str] = set()
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task = None
+        self.accepted = 0
+        self.duplicates = 0
+        self.flushes = 0
+
+    def accept(self, poll_id: str, option: str, client_id: Optional[str] = None):
+        poll = self.store.get(poll_id)
+        if poll is None:
+            raise VoteRejected(404, "poll")
+        if option not in poll.options:
+            raise VoteRejected(400, "option")
+        if self.seen is not None and client_id:
+            key = f"{poll_id}\0{client_id}"
+            if key in self._unsaved or key in self.seen:
+                self.duplicates += 1
+                raise VoteRejected(409, "duplicate")
+            self._unsaved.add(key)
+            self._clients.append(key)
+        counts = self.pending.get(poll_id)
+        if counts is None:
+            counts = self.pending[poll_id] = {}
+        counts[option] = counts.get(option, 0) + 1
+        self.accepted += 1
+
+    async def commit(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        await waiter
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        clients, self._clients = self._clients, []
+        waiters, self._waiters = self._waiters, []
+        # a poll whose create failed to journal is gone; its votes go with it
+        pending = {poll_id: counts for poll_id, counts in pending.items() if self.store.get(poll_id) is not None}
+        if pending:
+            # store first, then journal: a compaction running meanwhile must
+            # not snapshot a seq that includes this op without its counts
+            for poll_id, counts in pending.items():
+                self.store.add_votes(poll_id, counts)
+            try:
+                await self.journal.append({"op": "votes", "counts": pending})
+            except Exception as exc:
+                for poll_id, counts in pending.items():
+                    if self.store.get(poll_id) is not None:
+                        self.store.add_votes(poll_id, {option: -n for option, n in counts.items()})
+                self._unsaved.difference_update(clients)
+                self.accepted -= sum(sum(counts.values()) for counts in pending.values())
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+                return
+            for key in clients:
+                self.seen.add(key)
+            self._unsaved.difference_update(clients)
+            self.flushes += 1
+            if self.on_flush is not None:
+                for poll_id in pending:
+                    self.on_flush(poll_id)
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        stats = {"accepted": self.accepted, "flushes": self.flushes, "duplicates": self.duplicates}
+        if self.seen is not None:
+            stats["dedupe_keys"] = self.seen.count
+            stats["dedupe_capacity"] = self.seen.capacity
+        return stats
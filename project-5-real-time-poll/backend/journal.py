@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+from typing import List
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from store import PollStore
+
+COMMIT_INTERVAL = float(os.getenv("POLL_COMMIT_INTERVAL", "0.005"))
+COMPACT_EVERY = int(os.getenv("POLL_COMPACT_EVERY", "10000"))
+# The pre-journal database: read once to seed an empty data dir, never written
+LEGACY_FILE = "polls.json"
+
+
+def apply_op(store: PollStore, op: dict):
+    kind = op["op"]
+    if kind == "create":
+        store.put(op["id"], op["question"], {option: 0 for option in op["options"]}, op.get("ts"))
+    elif kind == "vote":
+        if store.get(op["id"]) is not None:
+            store.vote(op["id"], op["option"], op.get("n", 1))
+    elif kind == "votes":
+        # {"op": "votes", "counts": {poll_id: {option: n}}} — one flushed batch
+        for poll_id, deltas in op["counts"].items():
+            if store.get(poll_id) is not None:
+                store.add_votes(poll_id, deltas)
+
+
+class MemoryJournal:
+    async def open(self, store: PollStore):
+        pass
+
+    async def append(self, op: dict):
+        pass
+
+    async def close(self):
+        pass
+
+
+class LogJournal:
+    # polls.log holds the create/vote/votes ops since polls.snapshot.json;
+    # appends within COMMIT_INTERVAL share one fsync. The snapshot stores
+    # the poll id counter (next_id) next to the polls instead of deriving it
+    # from their ids, so the counter only ever moves forward. A failed
+    # commit cuts the log back to the last fsynced offset, so an op whose
+    # append raised is never replayed later.
+
+    def __init__(self, data_dir: str, commit_interval: float = COMMIT_INTERVAL,
+                 compact_every: int = COMPACT_EVERY, legacy_file: str = LEGACY_FILE):
+        self.data_dir = data_dir
+        self.commit_interval = commit_interval
+        self.compact_every = compact_every
+        self.legacy_file = legacy_file
+        self.log_path = os.path.join(data_dir, "polls.log")
+        self.old_log_path = self.log_path + ".1"
+        self.snapshot_path = os.path.join(data_dir, "polls.snapshot.json")
+        self.lock_path = os.path.join(data_dir, "polls.lock")
+        self._lock_file = None
+        self.store = None
+        self._file = None
+        self._seq = 0
+        self._since_snapshot = 0
+        self._durable = 0  # log size covered by the last successful fsync
+        self._waiters: List[asyncio.Future] = []
+        self._commit_task = None
+        self._io_lock = asyncio.Lock()
+
+    async def open(self, store: PollStore):
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._lock()
+        self.store = store
+        fresh = not os.path.exists(self.snapshot_path) and not os.path.exists(self.log_path)
+        if fresh and self.legacy_file and os.path.exists(self.legacy_file):
+            # Migration: polls.json becomes snapshot seq 0 straight away, so
+            # later startups (and a crash right after this one) ignore it
+            self._load_legacy()
+            self._write_snapshot(self._snapshot())
+        snapshot_seq = self._load_snapshot() if not fresh else 0
+        self._seq = snapshot_seq
+        for path in (self.old_log_path, self.log_path):
+            self._replay(path, snapshot_seq)
+        if os.path.exists(self.old_log_path):
+            # a previous compaction died before its snapshot landed
+            self._write_snapshot(self._snapshot())
+            os.remove(self.old_log_path)
+            self._since_snapshot = 0
+        self._file = open(self.log_path, "a", encoding="utf-8")
+        self._durable = os.path.getsize(self.log_path)
+        if self._since_snapshot >= self.compact_every:
+            await self.compact()
+
+    def _lock(self):
+        # One writer per data dir. Every process has its own store and seq
+        # counter, and a compaction in one would rotate the log out from under
+        # the others, so a second process (e.g. uvicorn --workers 2) fails to
+        # start instead of silently losing votes. The lock goes with the file.
+        lock_file = open(self.lock_path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"{self.data_dir} is already open in another process; run the poll server with one worker"
+            ) from None
+        self._lock_file = lock_file
+
+    def _load_legacy(self):
+        # {poll_id: {"question", "options": {option: votes}}}; votes are kept,
+        # creation time becomes now since the old format had none
+        try:
+            with open(self.legacy_file, encoding="utf-8") as f:
+                polls = json.load(f)
+        except ValueError:
+            return
+        for poll_id, data in polls.items():
+            self.store.put(poll_id, data["question"], data["options"])
+
+    def _load_snapshot(self) -> int:
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        for poll_id, question, options, created_at in snapshot["polls"]:
+            self.store.put(poll_id, question, dict(options), created_at)
+        self.store.next_id = max(self.store.next_id, snapshot["next_id"])
+        return snapshot["seq"]
+
+    def _replay(self, path: str, snapshot_seq: int):
+        if not os.path.exists(path):
+            return
+        good = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # no newline means the write never completed, even if the
+                    # JSON happens to parse; appends would land on this line
+                    break
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                if op["seq"] <= snapshot_seq:
+                    continue
+                apply_op(self.store, op)
+                self._seq = max(self._seq, op["seq"])
+                self._since_snapshot += 1
+        if good < os.path.getsize(path):
+            # unacknowledged partial line from a crash
+            os.truncate(path, good)
+
+    async def append(self, op: dict):
+        self._seq += 1
+        op["seq"] = self._seq
+        self._file.write(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._since_snapshot += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._commit_task is None:
+            self._commit_task = asyncio.create_task(self._group_commit())
+        await waiter
+
+    async def _group_commit(self):
+        await asyncio.sleep(self.commit_interval)
+        waiters, self._waiters = self._waiters, []
+        self._commit_task = None
+        async with self._io_lock:
+            try:
+                self._file.flush()
+                offset = self._file.tell()
+                await asyncio.to_thread(os.fsync, self._file.fileno())
+            except Exception as exc:
+                # ops appended while the fsync ran share the file; they go too
+                waiters += self._waiters
+                self._waiters = []
+                self._rewind()
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+                return
+            self._durable = offset
+        for waiter in waiters:
+            waiter.set_result(None)
+        if self._since_snapshot >= self.compact_every and not self._io_lock.locked():
+            await self.compact()
+
+    def _rewind(self):
+        # drop everything past the last fsync, buffered or already written, so
+        # a later fsync cannot make the failed ops durable behind their backs
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        os.truncate(self.log_path, self._durable)
+        self._file = open(self.log_path, "a", encoding="utf-8")
+
+    async def compact(self):
+        async with self._io_lock:
+            # no await until the log is rotated: the snapshot must match its seq
+            snapshot = self._snapshot()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.log_path, self.old_log_path)
+            self._file = open(self.log_path, "a", encoding="utf-8")
+            self._durable = 0
+            self._since_snapshot = 0
+            await asyncio.to_thread(self._write_snapshot, snapshot)
+            os.remove(self.old_log_path)
+
+    def _snapshot(self) -> dict:
+        return {
+            "seq": self._seq,
+            "next_id": self.store.next_id,
+            "polls": [[p.id, p.question, list(p.options.items()), p.created_at] for p in self.store],
+        }
+
+    def _write_snapshot(self, snapshot: dict):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def close(self):
+        if self._commit_task is not None:
+            await self._commit_task
+        if self._file is None:
+            return
+        if self._since_snapshot:
+            await self.compact()
+        self._file.close()
+        self._file = None
+        self._lock_file.close()
+        self._lock_file = None
+
+
+def open_journal():
+    backend = os.getenv("POLL_STORAGE", "log")
+    if backend == "memory":
+        return MemoryJournal()
+    return LogJournal(os.getenv("POLL_DATA_DIR", "./data"))
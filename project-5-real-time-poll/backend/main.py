@@ -1,11 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
 import json
-import os
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List
+from typing import List, Optional
 
-app = FastAPI()
+from hub import BroadcastHub
+from ingest import VoteIngestor, VoteRejected
+from journal import open_journal
+from results import ResultsCache, etag_for, etag_matches
+from store import PollStore
+
+# --- Деректер ---
+# Жадтағы опростар; әр өзгеріс журналға (data/polls.log) жазылады,
+# журнал мезгіл-мезгіл атомды snapshot-қа жинақталады. Деректер каталогына
+# тек бір процесс жаза алады, сондықтан uvicorn бір воркермен іске қосылады
+# (--workers 2 болса, екінші воркер іске қосылмайды)
+store = PollStore()
+journal = open_journal()
+# Нәтижелерді көрушілерге тарату: секундына ең көбі POLL_PUSH_RATE рет
+hub = BroadcastHub(store)
+SSE_HEARTBEAT = 15
+# Дауыстар жинақталып, POLL_FLUSH_INTERVAL сайын бір пакетпен сақталады
+votes = VoteIngestor(store, journal, on_flush=hub.notify)
+MAX_BATCH_VOTES = 1000
+# Нәтижелердің дайын JSON-ы, опрос version-ы өзгергенде ғана қайта құрылады
+results = ResultsCache()
+MAX_PAGE = 200
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await journal.open(store)
+    yield
+    await votes.close()
+    hub.close()
+    await journal.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS рұқсаттары ---
 origins = ["http://localhost:3000"]
@@ -15,25 +50,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-# --- Файл және деректер ---
-DATA_FILE = "polls.json"
-polls_db: Dict[str, Dict] = {}
-
-# --- Деректерді жүктеу ---
-if os.path.exists(DATA_FILE):
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        try:
-            polls_db = json.load(f)
-        except json.JSONDecodeError:
-            polls_db = {}
-
-# --- Сақтау функциясы ---
-def save_polls():
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(polls_db, f, indent=2, ensure_ascii=False)
-
 # --- Модельдер ---
 class PollCreate(BaseModel):
     question: str
@@ -42,52 +61,189 @@ class PollCreate(BaseModel):
 class VoteData(BaseModel):
     poll_id: str
     option: str
+    client_id: Optional[str] = None  # POLL_DEDUPE=1 болса қайта дауыс беруге жол бермейді (тек осы процесс ішінде, қайта іске қосқанша)
+
+class VoteBatch(BaseModel):
+    votes: List[VoteData]
+
+VOTE_ERRORS = {
+    "poll": "Опрос табылмады",
+    "option": "Мұндай нұсқа жоқ",
+    "duplicate": "Сіз бұл опросқа дауыс бердіңіз",
+}
 
 # --- Опрос жасау ---
+# Handler-лер async: id бөлу мен жазу event loop-та үзіліссіз орындалады,
+# сондықтан бір мезгілдегі екі сұраныс бір id алмайды. Дауыстардағыдай
+# алдымен жад, сосын журнал; журналға жазу сәтсіз болса, опрос жойылады
 @app.post("/api/poll/create")
-def create_poll(poll: PollCreate):
-    poll_id = str(len(polls_db) + 1)
+async def create_poll(poll: PollCreate):
     if not poll.options or len(poll.options) < 2:
         raise HTTPException(status_code=400, detail="Кемінде 2 нұсқа болуы керек")
 
-    polls_db[poll_id] = {
-        "question": poll.question,
-        "options": {opt: 0 for opt in poll.options}
-    }
-    save_polls()
-    return {"poll_id": poll_id}
+    created = store.create(poll.question, poll.options)
+    try:
+        await journal.append({
+            "op": "create",
+            "id": created.id,
+            "question": created.question,
+            "options": list(created.options),
+            "ts": created.created_at,
+        })
+    except Exception:
+        store.discard(created.id)
+        results.forget(created.id)
+        raise
+    return {"poll_id": created.id}
 
 # --- Опросты алу ---
+# ETag бойынша: опрос өзгермесе 304, денесіз
+def cached_json(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/api/poll/{poll_id}")
-def get_poll(poll_id: str):
-    poll = polls_db.get(poll_id)
+async def get_poll(poll_id: str, if_none_match: Optional[str] = Header(None)):
+    poll = store.get(poll_id)
     if not poll:
         raise HTTPException(status_code=404, detail="Опрос табылмады")
 
-    # dict -> list түрлендіру
-    options_list = [{"option": k, "votes": v} for k, v in poll["options"].items()]
-    return {
-        "question": poll["question"],
-        "options": options_list
-    }
+    body, etag = results.get(poll)
+    return cached_json(body, etag, if_none_match)
 
 # --- Дауыс беру ---
+# Тексерілген дауыс жадтағы есептегішке қосылады; жауап оның пакеті
+# журналға жазылғаннан кейін қайтады
 @app.post("/api/poll/vote")
-def vote(vote_data: VoteData):
-    poll = polls_db.get(vote_data.poll_id)
-    if not poll:
-        raise HTTPException(status_code=404, detail="Опрос табылмады")
-    if vote_data.option not in poll["options"]:
-        raise HTTPException(status_code=400, detail="Мұндай нұсқа жоқ")
-
-    poll["options"][vote_data.option] += 1
-    save_polls()
+async def vote(vote_data: VoteData):
+    try:
+        votes.accept(vote_data.poll_id, vote_data.option, vote_data.client_id)
+    except VoteRejected as exc:
+        raise HTTPException(status_code=exc.status, detail=VOTE_ERRORS[exc.reason])
+    await votes.commit()
     return {"message": "Дауыс қабылданды"}
 
+# --- Дауыстар пакеті ---
+# Жарамсыз дауыстар қалғандарын тоқтатпайды, олар rejected тізімінде қайтады
+@app.post("/api/poll/vote/batch")
+async def vote_batch(batch: VoteBatch):
+    if len(batch.votes) > MAX_BATCH_VOTES:
+        raise HTTPException(status_code=413, detail=f"Бір пакетте ең көбі {MAX_BATCH_VOTES} дауыс")
+    accepted = 0
+    rejected = []
+    for index, item in enumerate(batch.votes):
+        try:
+            votes.accept(item.poll_id, item.option, item.client_id)
+            accepted += 1
+        except VoteRejected as exc:
+            rejected.append({"index": index, "detail": VOTE_ERRORS[exc.reason]})
+    if accepted:
+        await votes.commit()
+    return {"accepted": accepted, "rejected": rejected}
+
 # --- Барлық опростар ---
+# /api/poll?sort=recent|votes&limit=50&cursor=... — cursor алдыңғы беттің next_cursor-ы
 @app.get("/api/poll")
-def list_all_poll():
-    return [
-        {"id": poll_id, "question": data["question"]}
-        for poll_id, data in polls_db.items()
-    ]
+async def list_all_poll(
+    sort: str = Query("recent", pattern="^(recent|votes)$"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    try:
+        if sort == "votes":
+            after = tuple(int(part) for part in cursor.split(".")) if cursor else None
+            if after is not None and len(after) != 2:
+                raise ValueError(cursor)
+            page = store.by_votes(limit + 1, after)
+        else:
+            page = store.recent(limit + 1, int(cursor) if cursor else None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Жарамсыз cursor")
+
+    # бір артық алып, келесі бет бар-жоғын білеміз
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        next_cursor = f"{last.total_votes}.{last.seq}" if sort == "votes" else str(last.seq)
+    body = json.dumps({
+        "polls": [
+            {"id": p.id, "question": p.question, "total_votes": p.total_votes, "created_at": p.created_at}
+            for p in page
+        ],
+        "next_cursor": next_cursor,
+    }, ensure_ascii=False, separators=(",", ":")).encode()
+    return cached_json(body, etag_for(body), if_none_match)
+
+# --- Нақты уақыттағы нәтижелер ---
+# WebSocket: әр tick-те {"question", "options", "delta", "version"} JSON-ы келеді
+@app.websocket("/ws/poll/{poll_id}")
+async def poll_socket(websocket: WebSocket, poll_id: str):
+    if store.get(poll_id) is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    subscription = hub.subscribe(poll_id)
+
+    async def push():
+        while True:
+            update = await subscription.get()
+            await websocket.send_text(update.text)
+
+    async def drain():
+        # клиенттен келгенді елемейміз, тек жабылғанын күтеміз
+        while True:
+            await websocket.receive_text()
+
+    # Қайсысы бірінші тоқтаса (клиент жабылды не жіберу сәтсіз), екіншісі тоқтатылады
+    tasks = {asyncio.create_task(push()), asyncio.create_task(drain())}
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        subscription.close()
+    for task in done:
+        exc = task.exception()
+        if exc is not None and not isinstance(exc, WebSocketDisconnect):
+            print(f"WebSocket {poll_id}: {exc!r}")
+            # клиент қайта қосылсын деп байланысты жабамыз
+            try:
+                await websocket.close(code=1011)
+            except RuntimeError:
+                pass
+
+# SSE: WebSocket өтпейтін желілер үшін сол деректер text/event-stream арқылы
+@app.get("/api/poll/{poll_id}/events")
+async def poll_events(poll_id: str, request: Request):
+    if store.get(poll_id) is None:
+        raise HTTPException(status_code=404, detail="Опрос табылмады")
+    subscription = hub.subscribe(poll_id)
+
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    update = await asyncio.wait_for(subscription.get(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # прокси байланысты үзіп тастамауы үшін
+                    yield b": ping\n\n"
+                    continue
+                yield update.sse
+        finally:
+            subscription.close()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+# --- Метрикалар ---
+@app.get("/api/metrics")
+async def get_metrics():
+    return {"hub": hub.stats(), "votes": votes.stats(), "results": results.stats()}
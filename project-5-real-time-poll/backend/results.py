@@ -0,0 +1,50 @@
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+
+from store import Poll
+
+
+def etag_for(body: bytes) -> str:
+    # Derived from the bytes rather than the poll version: versions start
+    # over at 0 after a restart while the counts do not
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResultsCache:
+    # Serialized GET /api/poll/{id} body and its ETag per poll, reused until
+    # the poll's version moves. The only polls ever removed are creates that
+    # failed to journal; their ids are not reused and their entry is dropped.
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, bytes, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, poll: Poll) -> Tuple[bytes, str]:
+        entry = self._entries.get(poll.id)
+        if entry is not None and entry[0] == poll.version:
+            self.hits += 1
+            return entry[1], entry[2]
+        self.misses += 1
+        body = json.dumps({
+            "question": poll.question,
+            "options": [{"option": k, "votes": v} for k, v in poll.options.items()],
+        }, ensure_ascii=False, separators=(",", ":")).encode()
+        etag = etag_for(body)
+        self._entries[poll.id] = (poll.version, body, etag)
+        return body, etag
+
+    def forget(self, poll_id: str):
+        self._entries.pop(poll_id, None)
+
+    def stats(self) -> dict:
+        return {"cached": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,116 @@
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class Poll:
+    __slots__ = ("id", "question", "options", "created_at", "version", "seq")
+
+    def __init__(self, poll_id: str, question: str, options: Dict[str, int], created_at: float):
+        self.id = poll_id
+        self.question = question
+        self.options = options  # option -> votes, in creation order
+        self.created_at = created_at
+        self.version = 0  # bumped on every change to the counts
+        self.seq = 0  # creation counter, set by the store; never reused
+
+    @property
+    def total_votes(self) -> int:
+        return sum(self.options.values())
+
+
+class PollStore:
+    # Polls by id. Ids are handed out from a counter that only moves
+    # forward, so two polls created at the same time can never share one.
+    # Polls are also kept in creation order for paging by recency; the
+    # ranking by total votes is rebuilt lazily when counts have changed.
+
+    def __init__(self):
+        self._polls: Dict[str, Poll] = {}
+        self._order: List[Poll] = []
+        self._seqs: List[int] = []  # seq of each poll in _order, for bisecting
+        self._next_seq = 0
+        self.next_id = 1
+        self.changes = 0  # bumped on every create or vote
+        self._ranking: List[Poll] = []
+        self._ranking_keys: List[Tuple[int, int]] = []
+        self._ranked_at = -1
+
+    def __len__(self) -> int:
+        return len(self._polls)
+
+    def __iter__(self) -> Iterator[Poll]:
+        return iter(self._polls.values())
+
+    def get(self, poll_id: str) -> Optional[Poll]:
+        return self._polls.get(poll_id)
+
+    def allocate_id(self) -> str:
+        poll_id = str(self.next_id)
+        self.next_id += 1
+        return poll_id
+
+    def put(self, poll_id: str, question: str, options: Dict[str, int],
+            created_at: Optional[float] = None) -> Poll:
+        poll = Poll(poll_id, question, dict(options), time.time() if created_at is None else created_at)
+        previous = self._polls.get(poll_id)
+        if previous is None:
+            poll.seq = self._next_seq
+            self._next_seq += 1
+            self._order.append(poll)
+            self._seqs.append(poll.seq)
+        else:
+            poll.seq = previous.seq
+            self._order[bisect_left(self._seqs, poll.seq)] = poll
+        self._polls[poll_id] = poll
+        self.changes += 1
+        if poll_id.isdigit() and int(poll_id) >= self.next_id:
+            self.next_id = int(poll_id) + 1
+        return poll
+
+    def create(self, question: str, options: List[str]) -> Poll:
+        return self.put(self.allocate_id(), question, {option: 0 for option in options})
+
+    def discard(self, poll_id: str):
+        # Undoes a create whose journal append failed. Neither its id nor its
+        # seq is handed out again, so caches keyed by id and cursors keyed by
+        # seq never confuse it with a later poll.
+        poll = self._polls.pop(poll_id, None)
+        if poll is None:
+            return
+        index = bisect_left(self._seqs, poll.seq)
+        del self._order[index]
+        del self._seqs[index]
+        self.changes += 1
+
+    def vote(self, poll_id: str, option: str, n: int = 1) -> Poll:
+        poll = self._polls[poll_id]
+        poll.options[option] += n
+        poll.version += 1
+        self.changes += 1
+        return poll
+
+    def add_votes(self, poll_id: str, deltas: Dict[str, int]) -> Poll:
+        # a whole batch of votes on one poll counts as a single version bump
+        poll = self._polls[poll_id]
+        for option, n in deltas.items():
+            poll.options[option] += n
+        poll.version += 1
+        self.changes += 1
+        return poll
+
+    # --- Paging ---
+    # Cursors are the sort key of the last poll on the previous page, so a
+    # page is found without counting from the start.
+    def recent(self, limit: int, before_seq: Optional[int] = None) -> List[Poll]:
+        end = len(self._order) if before_seq is None else bisect_left(self._seqs, before_seq)
+        return self._order[max(0, end - limit):end][::-1]
+
+    def by_votes(self, limit: int, after: Optional[Tuple[int, int]] = None) -> List[Poll]:
+        # after is (total_votes, seq) of the last poll seen; ties go newest first
+        if self._ranked_at != self.changes:
+            self._ranking = sorted(self._order, key=lambda p: (-p.total_votes, -p.seq))
+            self._ranking_keys = [(-p.total_votes, -p.seq) for p in self._ranking]
+            self._ranked_at = self.changes
+        start = 0 if after is None else bisect_right(self._ranking_keys, (-after[0], -after[1]))
+        return self._ranking[start:start + limit]
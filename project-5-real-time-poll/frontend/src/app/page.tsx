@@ -11,17 +11,22 @@ interface PollPreview {
 
 export default function Home() {
   const [polls, setPolls] = useState<PollPreview[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
 
-  useEffect(() => {
-    const fetchPolls = async () => {
-      try {
-        const res = await axios.get("http://localhost:8000/api/poll");
-        setPolls(res.data);
-      } catch (err) {
-        console.error('Қате:', err);
-      }
-    };
+  // Опростар беттеп келеді: әр сұраныс келесі беттің cursor-ын қайтарады
+  const fetchPolls = async (cursor: string | null = null) => {
+    try {
+      const res = await axios.get("http://localhost:8000/api/poll", {
+        params: { limit: 50, ...(cursor ? { cursor } : {}) },
+      });
+      setPolls((prev) => (cursor ? [...prev, ...res.data.polls] : res.data.polls));
+      setNextCursor(res.data.next_cursor);
+    } catch (err) {
+      console.error('Қате:', err);
+    }
+  };
 
+  useEffect(() => {
     fetchPolls();
   }, []);
 
@@ -51,6 +56,17 @@ export default function Home() {
           ))}
         </ul>
       )}
+
+      {nextCursor && (
+        <div className="mt-6 text-center">
+          <button
+            onClick={() => fetchPolls(nextCursor)}
+            className="px-5 py-2 bg-gray-700 hover:bg-gray-600 rounded-lg text-white"
+          >
+            Тағы көрсету
+          </button>
+        </div>
+      )}
     </main>
   );
 }
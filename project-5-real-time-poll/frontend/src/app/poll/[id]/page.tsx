@@ -36,18 +36,99 @@ export default function PollPage() {
     }
   };
 
+  // Нәтижелер WebSocket арқылы келеді. Үзілсе, кідіріспен (1с, 2с, 4с … 30с)
+  // қайта қосылады; WebSocket мүлде ашылмаса — SSE, ол да болмаса polling
   useEffect(() => {
     fetchPoll();
-    const interval = setInterval(fetchPoll, 3000);
-    return () => clearInterval(interval);
+    let ws: WebSocket | null = null;
+    let events: EventSource | null = null;
+    let interval: ReturnType<typeof setInterval> | null = null;
+    let retry: ReturnType<typeof setTimeout> | null = null;
+    let backoff = 1000;
+    let failedOpens = 0;
+    let closed = false;
+
+    const onResults = (data: string) => setPoll(JSON.parse(data));
+
+    const startPolling = () => {
+      if (closed || interval) return;
+      interval = setInterval(fetchPoll, 3000);
+    };
+
+    const startSSE = () => {
+      if (closed) return;
+      if (typeof EventSource === 'undefined') {
+        startPolling();
+        return;
+      }
+      events = new EventSource(`http://localhost:8000/api/poll/${id}/events`);
+      events.addEventListener('results', (e) => onResults((e as MessageEvent).data));
+      // EventSource өзі қайта қосылады; тек түпкілікті жабылса polling-ке көшеміз
+      events.onerror = () => {
+        if (events?.readyState === EventSource.CLOSED) {
+          events = null;
+          startPolling();
+        }
+      };
+    };
+
+    const connect = () => {
+      if (closed) return;
+      let opened = false;
+      try {
+        ws = new WebSocket(`ws://localhost:8000/ws/poll/${id}`);
+      } catch {
+        startSSE();
+        return;
+      }
+      ws.onopen = () => {
+        opened = true;
+        failedOpens = 0;
+        backoff = 1000;
+      };
+      ws.onmessage = (e) => onResults(e.data);
+      ws.onclose = () => {
+        ws = null;
+        if (closed) return;
+        if (!opened && ++failedOpens >= 2) {
+          startSSE();
+          return;
+        }
+        // үзіліс кезіндегі өзгерістерді жоғалтпау үшін бір рет оқимыз
+        fetchPoll();
+        retry = setTimeout(connect, backoff);
+        backoff = Math.min(backoff * 2, 30000);
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      ws?.close();
+      events?.close();
+      if (interval) clearInterval(interval);
+      if (retry) clearTimeout(retry);
+    };
   }, [id]);
 
+  // Бір браузерді бір дауыс беруші ретінде тану үшін (POLL_DEDUPE)
+  const clientId = () => {
+    let cid = localStorage.getItem('client_id');
+    if (!cid) {
+      cid = crypto.randomUUID();
+      localStorage.setItem('client_id', cid);
+    }
+    return cid;
+  };
+
   const handleVote = async () => {
     if (!selected || hasVoted) return;
     try {
       await axios.post(`http://localhost:8000/api/poll/vote`, {
         poll_id: id,
         option: selected,
+        client_id: clientId(),
       });
       localStorage.setItem(`voted_${id}`, selected);
       setHasVoted(true);